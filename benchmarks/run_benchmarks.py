@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ftd2xxhelper benchmark suite, run against the simulated D2XX library.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --output results.json
+
+Measures query latency percentiles, scan download throughput, device enumeration and instance
+creation time and allocations, and optionally replays captured sessions (--trace), then writes the results as JSON
+so runs can be compared over time.
+
+@organization: Santec Holdings Corporation.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import subprocess
+
+from src.ftd2xxhelper import Ftd2xxhelper, ReplayD2xx, probe_cache, device_registry
+from benchmarks.simulated_d2xx import SimulatedD2xx
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    ordered = sorted(samples)
+    return {f"p{p}": ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] for p in points}
+
+
+def measure_allocations(function):
+    """Runs function under tracemalloc; returns its result, peak traced bytes and net allocated blocks."""
+    tracemalloc.start()
+    before = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    result = function()
+    after = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"peak_bytes": peak, "net_blocks": after - before}
+
+
+def bench_query_latency(latency: float, queries: int):
+    results = []
+    for read_mode in Ftd2xxhelper.read_modes:
+        simulator = SimulatedD2xx(devices=1, latency=latency)
+        Ftd2xxhelper.set_library(simulator.as_library())
+        helper = Ftd2xxhelper(simulator.instruments[0].serial_number.encode("ascii"), read_mode=read_mode)
+        samples = []
+        for _ in range(queries):
+            start = time.perf_counter()
+            helper.query("*IDN?")
+            samples.append(time.perf_counter() - start)
+        helper.close_usb_connection()
+        results.append({
+            "name": "query_latency",
+            "params": {"read_mode": read_mode, "latency": latency, "queries": queries},
+            "metrics": dict(percentiles(samples), mean=sum(samples) / len(samples)),
+        })
+    return results
+
+
+def bench_scan_download(points_list, repeat: int):
+    results = []
+    simulator = SimulatedD2xx(devices=1, latency=0.002, bytes_per_second=40e6)
+    Ftd2xxhelper.set_library(simulator.as_library())
+    helper = Ftd2xxhelper(simulator.instruments[0].serial_number.encode("ascii"), read_mode="event")
+    variants = {
+        "santec_list": lambda: helper.get_all_data_points_from_last_scan_santec_command(),
+        "santec_compact": lambda: helper.get_all_data_points_from_last_scan_santec_command(compact=True),
+        "scpi_stream": lambda: sum(len(chunk) for chunk in helper.iter_scan_data("scpi", chunk_points=16384)),
+    }
+    for points in points_list:
+        simulator.set_scan_points(points)
+        for name, download in variants.items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                download()
+                samples.append(time.perf_counter() - start)
+            _, allocations = measure_allocations(download)
+            best = min(samples)
+            results.append({
+                "name": "scan_download",
+                "params": {"variant": name, "points": points},
+                "metrics": dict(allocations, seconds=best, points_per_second=points / best,
+                                megabytes_per_second=points * 4 / best / 1e6),
+            })
+    helper.close_usb_connection()
+    return results
+
+
+def bench_enumeration(device_counts, probe_latency: float):
+    results = []
+    for devices in device_counts:
+        simulator = SimulatedD2xx(devices=devices, probe_latency=probe_latency)
+        Ftd2xxhelper.set_library(simulator.as_library())
+        for parallel in (False, True):
+            probe_cache.invalidate()
+            start = time.perf_counter()
+            found = Ftd2xxhelper.list_devices(parallel=parallel)
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            Ftd2xxhelper.list_devices(parallel=parallel)
+            cached = time.perf_counter() - start
+            results.append({
+                "name": "enumeration",
+                "params": {"devices": devices, "parallel": parallel, "probe_latency": probe_latency},
+                "metrics": {"seconds": cold, "cached_seconds": cached, "found": len(found)},
+            })
+    return results
+
+
+def bench_open(device_counts, opens: int):
+    """Time to create and close an instance of the last device, with a device scan or opened directly."""
+    results = []
+    for devices in device_counts:
+        simulator = SimulatedD2xx(devices=devices)
+        Ftd2xxhelper.set_library(simulator.as_library())
+        serial_number = simulator.instruments[-1].serial_number
+        for direct in (False, True):
+            probe_cache.invalidate()
+            device_registry.update([])
+            samples = []
+            for _ in range(opens):
+                start = time.perf_counter()
+                Ftd2xxhelper(serial_number, direct=direct).close_usb_connection()
+                samples.append(time.perf_counter() - start)
+            results.append({
+                "name": "open",
+                "params": {"devices": devices, "direct": direct},
+                "metrics": dict(percentiles(samples), first=samples[0]),
+            })
+    return results
+
+
+def bench_replay(trace: str, realtime: bool):
+    """Re-sends the writes of a captured session and reads back the recorded replies through read()."""
+    replay = ReplayD2xx(trace, realtime=realtime)
+    Ftd2xxhelper.set_library(replay.as_library())
+    helper = Ftd2xxhelper(replay.serial_number)
+    samples = []
+    start = time.perf_counter()
+    for written, replies in replay.exchanges:
+        expected = sum(len(payload) for _, payload in replies)
+        begin = time.perf_counter()
+        helper._send_bytes(written)
+        if expected:
+            helper.read(1, expected)
+            samples.append(time.perf_counter() - begin)
+    total = time.perf_counter() - start
+    helper.close_usb_connection()
+    metrics = {"seconds": total, "exchanges": len(replay.exchanges), "mismatches": replay.mismatches}
+    if samples:
+        metrics.update(percentiles(samples))
+    return [{"name": "replay", "params": {"trace": trace, "realtime": realtime}, "metrics": metrics}]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Ftd2xxhelper against a simulated D2XX library.")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller scans")
+    parser.add_argument("--trace", action="append", default=[], help="captured session to replay (repeatable)")
+    parser.add_argument("--realtime", action="store_true", help="replay traces with their recorded timing")
+    args = parser.parse_args(argv)
+
+    queries = 50 if args.quick else 500
+    points_list = [1000, 10000] if args.quick else [1000, 10000, 100000, 200000]
+    device_counts = [1, 8] if args.quick else [1, 8, 32]
+
+    results = []
+    results += bench_query_latency(latency=0.002, queries=queries)
+    results += bench_scan_download(points_list, repeat=2 if args.quick else 5)
+    results += bench_enumeration(device_counts, probe_latency=0.005)
+    results += bench_open(device_counts, opens=20 if args.quick else 200)
+    for trace in args.trace:
+        results += bench_replay(trace, args.realtime)
+    Ftd2xxhelper.set_library(None)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in results:
+        metrics = ", ".join(f"{k}={v:.6g}" if isinstance(v, float) else f"{k}={v}" for k, v in result["metrics"].items())
+        print(f"{result['name']:<14} {json.dumps(result['params'])}: {metrics}")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
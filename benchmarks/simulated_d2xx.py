@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""
+Simulated D2XX library emulating Santec instruments, for benchmarking Ftd2xxhelper without hardware.
+
+@organization: Santec Holdings Corporation.
+"""
+
+import time
+import ctypes
+import struct
+import threading
+
+from src.ftd2xxhelper import PythonD2xx, FT_OK
+
+FT_INVALID_HANDLE = 1
+FT_DEVICE_NOT_FOUND = 2
+
+
+class SimulatedInstrument(object):
+    """Command interpreter and receive queue of one simulated instrument."""
+
+    def __init__(self, serial_number: str, latency: float, scan_points: int, bytes_per_second: float):
+        self.serial_number = serial_number
+        self.latency = latency
+        self.scan_points = scan_points
+        self.bytes_per_second = bytes_per_second
+        self.settings = {}
+        self.block_terminator = b""  # sent after a definite-length block, e.g. b"\r"
+        self.read_timeout = 1.0
+        self.event_char = None
+        self.rx = bytearray()
+        self.pending = []  # (time the first byte is sent, response bytes)
+        self.lock = threading.Lock()
+
+    def respond(self, command: str):
+        header, _, argument = command.partition(" ")
+        header = header.upper()
+        if header == "*IDN?":
+            return f"SANTEC TSL-570,{self.serial_number},0029.0067.0001\r".encode("ascii")
+        if header in ("READOUT:POINTS?", "READ:POIN?", "TN"):
+            return f"{self.scan_points}\r".encode("ascii")
+        if header in ("READOUT:DATA?", "READ:DAT?"):
+            # An optional 'start,count' argument selects a range of the points.
+            start, count = map(int, argument.split(",")) if argument else (0, self.scan_points)
+            count = max(0, min(count, self.scan_points - start))
+            payload = struct.pack(f">{count}f", *(1500.0 + i * 0.001 for i in range(start, start + count)))
+            length = str(len(payload)).encode("ascii")
+            return b"#" + str(len(length)).encode("ascii") + length + payload + self.block_terminator
+        if header == "TA":
+            return struct.pack(f">{self.scan_points}I", *range(self.scan_points))
+        if header.endswith("?"):
+            return f"{self.settings.get(header[:-1], '0')}\r".encode("ascii")
+        self.settings[header] = argument
+        return b""
+
+    def write(self, data: bytes):
+        now = time.monotonic()
+        with self.lock:
+            for command in data.decode("ascii").split("\r"):
+                if command:
+                    response = self.respond(command)
+                    if response:
+                        start = max([now + self.latency] + [ready + len(r) / self.bytes_per_second
+                                                            for ready, r in self.pending])
+                        self.pending.append((start, response))
+
+    def available(self):
+        """Moves the bytes that have 'arrived' by now into rx and returns the rx length."""
+        now = time.monotonic()
+        with self.lock:
+            while self.pending:
+                ready, response = self.pending[0]
+                if now < ready:
+                    break
+                sent = min(len(response), int((now - ready) * self.bytes_per_second) + 1)
+                self.rx += response[:sent]
+                if sent == len(response):
+                    self.pending.pop(0)
+                else:
+                    self.pending[0] = (now, response[sent:])
+                    break
+            return len(self.rx)
+
+
+class SimulatedD2xx(PythonD2xx):
+    """
+    Emulates a number of Santec instruments behind the D2XX API. Responses become readable after
+    latency seconds and stream at bytes_per_second; EEPROM reads take probe_latency seconds.
+    Install with Ftd2xxhelper.set_library(SimulatedD2xx(...).as_library()).
+    """
+
+    def __init__(self, devices: int = 1, latency: float = 0.002, scan_points: int = 1000,
+                 bytes_per_second: float = 20e6, probe_latency: float = 0.0):
+        self.instruments = [
+            SimulatedInstrument(f"SIM{i:05d}", latency, scan_points, bytes_per_second) for i in range(devices)
+        ]
+        self.probe_latency = probe_latency
+        # EEPROM reads started, and the most that were in progress at the same time.
+        self.probes_started = 0
+        self.max_concurrent_probes = 0
+        self._probes_active = 0
+        self.handles = {}
+        self.next_handle = 1
+        self.lock = threading.Lock()
+
+    def set_scan_points(self, points: int):
+        for instrument in self.instruments:
+            instrument.scan_points = points
+
+    def FT_CreateDeviceInfoList(self, num_devices):
+        num_devices.contents.value = len(self.instruments)
+        return FT_OK
+
+    def FT_GetDeviceInfoList(self, nodes, num_devices):
+        for i, instrument in enumerate(self.instruments):
+            nodes[i].Type = 8
+            nodes[i].LocId = 0x1000 + i
+            nodes[i].SerialNumber = instrument.serial_number.encode("ascii")
+            nodes[i].Description = b"SANTEC TSL-570"
+        num_devices.contents.value = len(self.instruments)
+        return FT_OK
+
+    def FT_OpenEx(self, argument, flags, handle):
+        serial_number = ctypes.string_at(argument).decode("ascii") if flags & 1 else None
+        for i, instrument in enumerate(self.instruments):
+            if instrument.serial_number == serial_number or (flags & 4 and argument == 0x1000 + i):
+                with self.lock:
+                    handle.contents.value = self.next_handle
+                    self.handles[self.next_handle] = instrument
+                    self.next_handle += 1
+                return FT_OK
+        return FT_DEVICE_NOT_FOUND
+
+    def FT_Close(self, handle):
+        with self.lock:
+            return FT_OK if self.handles.pop(handle, None) is not None else FT_INVALID_HANDLE
+
+    def FT_EE_Read(self, handle, program_data):
+        if handle not in self.handles:
+            return FT_INVALID_HANDLE
+        with self.lock:
+            self.probes_started += 1
+            self._probes_active += 1
+            self.max_concurrent_probes = max(self.max_concurrent_probes, self._probes_active)
+        try:
+            time.sleep(self.probe_latency)
+        finally:
+            with self.lock:
+                self._probes_active -= 1
+        ctypes.memmove(program_data.contents.Manufacturer, b"SANTEC\0", 7)
+        ctypes.memmove(program_data.contents.SerialNumber, self.handles[handle].serial_number.encode("ascii") + b"\0", 9)
+        ctypes.memmove(program_data.contents.Description, b"SANTEC TSL-570\0", 15)
+        return FT_OK
+
+    def FT_SetTimeouts(self, handle, read_timeout, write_timeout):
+        self.handles[handle].read_timeout = read_timeout / 1000.0
+        return FT_OK
+
+    def FT_SetChars(self, handle, event_char, event_enabled, error_char, error_enabled):
+        self.handles[handle].event_char = event_char if event_enabled else None
+        return FT_OK
+
+    def FT_Purge(self, handle, mask):
+        instrument = self.handles[handle]
+        with instrument.lock:
+            instrument.rx.clear()
+            instrument.pending.clear()
+        return FT_OK
+
+    def FT_GetQueueStatus(self, handle, available):
+        instrument = self.handles.get(handle)
+        if instrument is None:
+            return FT_INVALID_HANDLE
+        available.contents.value = instrument.available()
+        return FT_OK
+
+    def FT_Read(self, handle, buffer, count, bytes_read):
+        instrument = self.handles.get(handle)
+        if instrument is None:
+            return FT_INVALID_HANDLE
+        # Like the real driver, block until count bytes arrived or the read timeout expired.
+        deadline = time.monotonic() + instrument.read_timeout
+        while instrument.available() < count and time.monotonic() < deadline:
+            time.sleep(0.0002)
+        with instrument.lock:
+            n = min(count, len(instrument.rx))
+            ctypes.memmove(buffer, bytes(instrument.rx[:n]), n)
+            del instrument.rx[:n]
+        bytes_read.contents.value = n
+        return FT_OK
+
+    def FT_Write(self, handle, buffer, count, bytes_written):
+        instrument = self.handles.get(handle)
+        if instrument is None:
+            return FT_INVALID_HANDLE
+        instrument.write(ctypes.string_at(buffer, count))
+        bytes_written.contents.value = count
+        return FT_OK
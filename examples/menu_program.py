@@ -11,7 +11,10 @@ import sys
 import time
 
 # Import the Ftd2xxhelper class.
-from src.ftd2xxhelper import Ftd2xxhelper
+from src.ftd2xxhelper import Ftd2xxhelper, enable_logging
+
+# Write the driver log to output_python_ftdi.log
+enable_logging()
 
 # List of detected devices
 try:
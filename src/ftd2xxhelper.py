@@ -9,24 +9,102 @@ Version: 0.2.1
 Last updated: Mon Feb 03 18:08:00 2025
 """
 
+import os
 import sys
+import mmap
 import time
+import array
+import bisect
 import ctypes
 import struct
 import string
+import json
+import asyncio
+import inspect
+import threading
+import functools
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait
 from ctypes import Array
-from typing import List, Any
+from contextlib import contextmanager
+from typing import List, Any, NamedTuple
 
 # Setup logging
 import logging
+import logging.handlers
+import queue
 
-# Configure the logging
-logging.basicConfig(
-    filename='output_python_ftdi.log',  # Name of the log file
-    filemode='a',
-    format='%(asctime)s - %(levelname)s - %(message)s',  # Log format
-    level=logging.DEBUG  # Set the logging level
-)
+# The module logs through its own logger and stays silent until enable_logging() is called,
+# so importing it does not touch the logging configuration or the file system.
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+_log_listeners = []
+
+
+def enable_logging(filename: str = 'output_python_ftdi.log', level: int = logging.DEBUG, background: bool = False):
+    """
+    Writes the module log to filename, as importing this module used to do.
+    Records below level are dropped before any message formatting. With background, records are
+    queued by a QueueHandler and written to the file by a listener thread, off the I/O path.
+    """
+    handler = logging.FileHandler(filename, mode='a')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    if background:
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        listener.start()
+        _log_listeners.append(listener)
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    else:
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return handler
+
+
+def disable_logging():
+    """Removes the handlers added by enable_logging() and stops the background listener threads."""
+    for handler in list(logger.handlers):
+        if not isinstance(handler, logging.NullHandler):
+            logger.removeHandler(handler)
+            handler.close()
+    while _log_listeners:
+        listener = _log_listeners.pop()
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+    logger.setLevel(logging.NOTSET)
+
+
+class FrameRing(object):
+    """Keeps the most recent TX / RX frames in memory, so they can be dumped after a failure."""
+
+    __slots__ = ["_frames"]
+
+    def __init__(self, size: int = 256):
+        self._frames = collections.deque(maxlen=size)
+
+    def record(self, direction: str, data):
+        self._frames.append((time.time(), direction, bytes(data)))
+
+    def frames(self):
+        """Returns the recorded (timestamp, direction, data) tuples, oldest first."""
+        return list(self._frames)
+
+    def clear(self):
+        self._frames.clear()
+
+    def dump(self, filename: str):
+        """Writes one line per frame: timestamp, direction, hex bytes and printable representation."""
+        with open(filename, "a") as f:
+            for timestamp, direction, data in list(self._frames):
+                stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+                f.write(f"{stamp}.{int(timestamp * 1000) % 1000:03d} {direction} {data.hex()} {data!r}\n")
+
+
+# array.array typecode holding unsigned 32-bit words on this platform.
+UINT32_TYPECODE = "I" if array.array("I").itemsize == 4 else "L"
 
 
 class FtNode(ctypes.Structure):
@@ -59,8 +137,1261 @@ class FtProgramData(ctypes.Structure):
     ]
 
 
+class ProbeCache(object):
+    """
+    Remembers the EEPROM manufacturer of FTDI devices, keyed by serial number and location ID,
+    so that known devices can be classified without opening them again.
+    """
+
+    __slots__ = ["ttl", "_entries", "_lock"]
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, serial_number: bytes, location_id: int):
+        """Returns the cached manufacturer, or None when unknown or older than ttl seconds."""
+        with self._lock:
+            entry = self._entries.get((serial_number, location_id))
+            if entry is None:
+                return None
+            manufacturer, timestamp = entry
+            if time.monotonic() - timestamp > self.ttl:
+                del self._entries[(serial_number, location_id)]
+                return None
+            return manufacturer
+
+    def put(self, serial_number: bytes, location_id: int, manufacturer: str):
+        with self._lock:
+            self._entries[(serial_number, location_id)] = (manufacturer, time.monotonic())
+
+    def invalidate(self, serial_number: bytes | None = None, location_id: int | None = None):
+        """Drops the entries matching serial_number and / or location_id, or every entry when both are None."""
+        with self._lock:
+            for key in list(self._entries):
+                if (serial_number is None or key[0] == serial_number) and \
+                        (location_id is None or key[1] == location_id):
+                    del self._entries[key]
+
+    def retain(self, devices):
+        """Drops the entries of devices that are no longer attached."""
+        present = {(device.SerialNumber, device.LocId) for device in devices}
+        with self._lock:
+            for key in list(self._entries):
+                if key not in present:
+                    del self._entries[key]
+
+
+# Shared by list_devices(), get_dev_info_list() and initialize().
+probe_cache = ProbeCache()
+
+
+class DeviceRegistry(object):
+    """
+    Indexes the FtNode entries of the last device enumeration by serial number, location ID and
+    description, so a device is selected with a dictionary lookup instead of a scan of the list.
+    """
+
+    __slots__ = ["_nodes", "_by_serial", "_by_location", "_by_description", "_lock"]
+
+    def __init__(self):
+        self._nodes = []
+        self._by_serial = {}
+        self._by_location = {}
+        self._by_description = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bytes(value: str | bytes):
+        return value.encode("ascii") if isinstance(value, str) else bytes(value)
+
+    def update(self, devices):
+        """Replaces the registry with copies of the enumerated devices."""
+        # The new indexes are built aside and swapped in at once, so a lookup never sees a partial registry.
+        nodes = []
+        by_serial = {}
+        by_location = {}
+        by_description = {}
+        for device in devices:
+            node = FtNode.from_buffer_copy(device)
+            nodes.append(node)
+            by_serial.setdefault(node.SerialNumber, node)
+            by_location.setdefault(node.LocId, node)
+            by_description.setdefault(node.Description, []).append(node)
+        with self._lock:
+            self._nodes = nodes
+            self._by_serial = by_serial
+            self._by_location = by_location
+            self._by_description = by_description
+
+    def snapshot(self):
+        """Returns a registry sharing the current indexes, which a later update() leaves unchanged."""
+        snapshot = DeviceRegistry()
+        with self._lock:
+            snapshot._nodes = self._nodes
+            snapshot._by_serial = self._by_serial
+            snapshot._by_location = self._by_location
+            snapshot._by_description = self._by_description
+        return snapshot
+
+    def add(self, device: FtNode):
+        node = FtNode.from_buffer_copy(device)
+        with self._lock:
+            self._nodes.append(node)
+            self._by_serial.setdefault(node.SerialNumber, node)
+            self._by_location.setdefault(node.LocId, node)
+            self._by_description.setdefault(node.Description, []).append(node)
+        return node
+
+    def by_serial(self, serial_number: str | bytes) -> FtNode | None:
+        return self._by_serial.get(DeviceRegistry._bytes(serial_number))
+
+    def by_location(self, location_id: int) -> FtNode | None:
+        return self._by_location.get(location_id)
+
+    def by_description(self, description: str | bytes):
+        return list(self._by_description.get(DeviceRegistry._bytes(description), ()))
+
+    def first(self, description_prefix: str | bytes = b"SANTEC") -> FtNode | None:
+        """Returns the first enumerated device whose description starts with description_prefix."""
+        prefix = DeviceRegistry._bytes(description_prefix)
+        for description, nodes in list(self._by_description.items()):
+            if description.startswith(prefix):
+                return nodes[0]
+        return None
+
+    def nodes(self):
+        return list(self._nodes)
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+# Updated by every enumeration, and by direct opens of devices that were not enumerated yet.
+device_registry = DeviceRegistry()
+
+
+class LinkProfile(NamedTuple):
+    """USB link settings applied together by Ftd2xxhelper.set_link_profile()."""
+    baud_rate: int  # must match the instrument; ignored by the chip in FIFO mode
+    latency_timer: int  # ms the chip waits before sending a short packet, 2 - 255
+    in_transfer_size: int  # USB IN request size in bytes, multiple of 64 up to 65536
+    out_transfer_size: int  # USB OUT request size in bytes
+    read_timeout: int  # ms
+    write_timeout: int  # ms
+
+
+LINK_PROFILES = {
+    # FTDI defaults, the settings the driver has always used.
+    "compat": LinkProfile(9600, 16, 4096, 4096, 1000, 1000),
+    # Short replies are sent after 2 ms instead of waiting out the default 16 ms latency timer.
+    "low-latency": LinkProfile(9600, 2, 512, 512, 1000, 1000),
+    # Largest USB requests and a longer read timeout for scan downloads.
+    "bulk": LinkProfile(9600, 16, 65536, 4096, 5000, 1000),
+}
+
+
+class ReconnectPolicy(NamedTuple):
+    """Bounded exponential backoff used by Ftd2xxhelper.reconnect()."""
+    attempts: int = 5
+    initial_delay: float = 0.005  # s before the second attempt
+    max_delay: float = 0.5  # s
+    factor: float = 2.0
+
+
+class AdaptiveTiming(object):
+    """
+    Learns the response latency of each command mnemonic (an EWMA and a high percentile over a
+    sliding window) and derives the pause after a write and the read deadline of a query from
+    them, bounded by hard limits. Unknown commands use the fixed defaults.
+    """
+
+    __slots__ = [
+        "alpha", "percentile", "window", "margin",
+        "default_delay", "min_delay", "max_delay",
+        "min_deadline", "max_deadline",
+        "_stats", "_lock"
+    ]
+
+    def __init__(self, alpha: float = 0.2, percentile: float = 0.95, window: int = 64, margin: float = 1.5,
+                 default_delay: float = 0.020, min_delay: float = 0.0, max_delay: float = 0.5,
+                 min_deadline: float = 0.5, max_deadline: float = 30.0):
+        self.alpha = alpha
+        self.percentile = percentile
+        self.window = window
+        self.margin = margin
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def mnemonic(command: str):
+        """The command header, e.g. 'WAV' for 'WAV 1550' and 'WAV?' for 'WAV?'."""
+        parts = command.strip().split(None, 1)
+        return parts[0].upper() if parts else ""
+
+    def record(self, command: str, latency: float):
+        """Adds one observed response latency (seconds) for the command."""
+        key = AdaptiveTiming.mnemonic(command)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = {
+                    "count": 0, "latency": latency,
+                    "samples": collections.deque(maxlen=self.window),
+                }
+            else:
+                stats["latency"] += self.alpha * (latency - stats["latency"])
+            stats["count"] += 1
+            stats["samples"].append(latency)
+
+    def stats(self, command: str):
+        """Returns count, EWMA latency and latency percentile of the command, or None."""
+        with self._lock:
+            stats = self._stats.get(AdaptiveTiming.mnemonic(command))
+            if stats is None:
+                return None
+            samples = sorted(stats["samples"])
+            high = samples[min(len(samples) - 1, int(self.percentile * len(samples)))]
+            return {"count": stats["count"], "latency": stats["latency"], "percentile": high}
+
+    def read_deadline(self, command: str, default: float):
+        """Read deadline for a query: the latency percentile times margin, or default when unknown."""
+        stats = self.stats(command)
+        if stats is None:
+            return default
+        return min(self.max_deadline, max(self.min_deadline, self.margin * stats["percentile"]))
+
+    def write_delay(self, command: str):
+        """
+        Pause after writing a command. A write has no response to time, so the processing time is
+        taken from the EWMA latency of the matching query ('WAV?' for 'WAV 1550').
+        """
+        key = AdaptiveTiming.mnemonic(command)
+        stats = self.stats(key if key.endswith("?") else key + "?")
+        if stats is None:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, stats["latency"]))
+
+    def reset(self, command: str | None = None):
+        """Forgets what was learned for the command, or for every command."""
+        with self._lock:
+            if command is None:
+                self._stats.clear()
+            else:
+                self._stats.pop(AdaptiveTiming.mnemonic(command), None)
+
+
+class QueryCache(object):
+    """
+    LRU cache of the responses of queries whose answer only changes when a setting is written.
+    Only queries listed in cacheable are stored. Headers are compared in their SCPI short form
+    ('POWer' and 'POW' are the same). Writing a command drops the cached queries with the same
+    last header node ('WAV 1550' and 'SOUR:WAV 1550' drop 'WAV?'), plus the queries listed for it
+    in invalidates, and the commands in clear_on (e.g. '*RST') drop every entry. Compound commands
+    are split at ';', and a write that cannot be parsed drops every entry.
+    """
+
+    __slots__ = ["max_entries", "cacheable", "invalidates", "clear_on", "hits", "misses", "_entries", "_lock"]
+
+    def __init__(self, cacheable=("*IDN?",), max_entries: int = 128, invalidates=None,
+                 clear_on=("*RST", "*RCL")):
+        self.max_entries = max_entries
+        self.cacheable = {QueryCache._header(command) for command in cacheable}
+        self.invalidates = {
+            QueryCache._header(command): {QueryCache._header(query) for query in queries}
+            for command, queries in (invalidates or {}).items()
+        }
+        self.clear_on = {QueryCache._header(command) for command in clear_on}
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _node(node: str):
+        # The short form of a keyword is its first four letters, or three when the fourth is a
+        # vowel; a numeric suffix is kept ('CHANnel2' is 'CHAN2').
+        keyword = node.rstrip(string.digits)
+        if len(keyword) > 3 and not keyword.startswith("*"):
+            keyword = keyword[:3] if keyword[3] in "AEIOU" else keyword[:4]
+        return keyword + node[len(node.rstrip(string.digits)):]
+
+    @staticmethod
+    def _header(command: str):
+        """The header of a single command in short form, e.g. 'SOUR:POW?' for ':SOURce:POWer?'. None when unparsable."""
+        header = AdaptiveTiming.mnemonic(command).lstrip(":")
+        query = header.endswith("?")
+        nodes = header[:-1].split(":") if query else header.split(":")
+        if not all(node.lstrip("*").isalnum() for node in nodes):
+            return None
+        return ":".join(QueryCache._node(node) for node in nodes) + ("?" if query else "")
+
+    @staticmethod
+    def _leaf(header: str):
+        return header.rsplit(":", 1)[-1]
+
+    @staticmethod
+    def _key(command: str):
+        header, _, argument = command.strip().partition(" ")
+        return " ".join([QueryCache._header(header) or header.upper()] + argument.upper().split())
+
+    def is_cacheable(self, command: str):
+        return ";" not in command and QueryCache._header(command) in self.cacheable
+
+    def get(self, command: str):
+        """Returns the cached response, or None. Counts a hit or a miss."""
+        key = QueryCache._key(command)
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return response
+
+    def put(self, command: str, response: str):
+        key = QueryCache._key(command)
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, command: str | None = None):
+        """Drops the entries affected by writing command, or every entry when command is None."""
+        with self._lock:
+            if command is None:
+                self._entries.clear()
+                return
+            leaves = set()
+            dropped = set()
+            for part in command.split(";"):
+                if not part.strip():
+                    continue
+                header = QueryCache._header(part)
+                if header is None or header in self.clear_on:
+                    self._entries.clear()
+                    return
+                if header.endswith("?"):
+                    continue
+                leaves.add(QueryCache._leaf(header) + "?")
+                dropped |= self.invalidates.get(header, set())
+            for key in list(self._entries):
+                header = QueryCache._header(key)
+                if header is None or header in dropped or QueryCache._leaf(header) in leaves:
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class LatencyHistogram(object):
+    """Count, total, maximum and 1-2-5 log-spaced buckets (1 us to 10 s) of latencies in seconds."""
+
+    BOUNDS = tuple(m * 10.0 ** e for e in range(-6, 1) for m in (1, 2, 5)) + (10.0,)
+
+    __slots__ = ["count", "total", "max", "buckets"]
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LatencyHistogram.BOUNDS) + 1)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(LatencyHistogram.BOUNDS, seconds)] += 1
+
+    def percentile(self, p: float):
+        """Upper bound of the bucket holding the p-th percentile (capped at the maximum)."""
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bound, count in zip(LatencyHistogram.BOUNDS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {
+                (f"<={bound:g}" if i < len(LatencyHistogram.BOUNDS) else f">{LatencyHistogram.BOUNDS[-1]:g}"): count
+                for i, (bound, count) in enumerate(zip(LatencyHistogram.BOUNDS + (float("inf"),), self.buckets))
+                if count
+            },
+        }
+
+
+class MetricsRegistry(object):
+    """
+    Counters and latency histograms per instrument: D2XX calls, command mnemonics, query latency,
+    bytes in and out, FT status codes and reconnects. Instances enable it with enable_metrics(),
+    and several instances can share one registry.
+    """
+
+    __slots__ = ["_instruments", "_lock"]
+
+    def __init__(self):
+        self._instruments = {}
+        self._lock = threading.Lock()
+
+    def _instrument(self, serial_number):
+        key = serial_number.decode("ascii", "replace") if isinstance(serial_number, bytes) else str(serial_number)
+        instrument = self._instruments.get(key)
+        if instrument is None:
+            instrument = self._instruments[key] = {
+                "ft_calls": {}, "commands": {}, "queries": {}, "status": {},
+                "bytes_out": 0, "bytes_in": 0, "reconnects": 0, "downtime": 0.0,
+            }
+        return instrument
+
+    def record_call(self, serial_number, name: str, seconds: float, status: int, sent: int = 0, received: int = 0):
+        with self._lock:
+            instrument = self._instrument(serial_number)
+            histogram = instrument["ft_calls"].get(name)
+            if histogram is None:
+                histogram = instrument["ft_calls"][name] = LatencyHistogram()
+            histogram.add(seconds)
+            instrument["bytes_out"] += sent
+            instrument["bytes_in"] += received
+            if status != FT_OK:
+                status_name = FT_STATUS_NAMES[status] if 0 <= status < len(FT_STATUS_NAMES) else str(status)
+                instrument["status"][status_name] = instrument["status"].get(status_name, 0) + 1
+
+    def record_command(self, serial_number, command: str):
+        mnemonic = AdaptiveTiming.mnemonic(command)
+        with self._lock:
+            commands = self._instrument(serial_number)["commands"]
+            commands[mnemonic] = commands.get(mnemonic, 0) + 1
+
+    def record_query(self, serial_number, command: str, seconds: float):
+        mnemonic = AdaptiveTiming.mnemonic(command)
+        with self._lock:
+            queries = self._instrument(serial_number)["queries"]
+            histogram = queries.get(mnemonic)
+            if histogram is None:
+                histogram = queries[mnemonic] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def record_reconnect(self, serial_number, downtime: float):
+        with self._lock:
+            instrument = self._instrument(serial_number)
+            instrument["reconnects"] += 1
+            instrument["downtime"] += downtime
+
+    def snapshot(self):
+        """Returns a copy of every metric as plain dictionaries, keyed by instrument serial number."""
+        with self._lock:
+            return {
+                key: dict(
+                    instrument,
+                    ft_calls={name: histogram.to_dict() for name, histogram in instrument["ft_calls"].items()},
+                    queries={name: histogram.to_dict() for name, histogram in instrument["queries"].items()},
+                    commands=dict(instrument["commands"]),
+                    status=dict(instrument["status"]),
+                )
+                for key, instrument in self._instruments.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._instruments.clear()
+
+    def export_json(self, filename: str):
+        with open(filename, "w") as f:
+            json.dump({"timestamp": time.time(), "instruments": self.snapshot()}, f, indent=2)
+
+    def export_text(self, filename: str):
+        """Writes one line per metric, grouped by instrument, with latencies in microseconds."""
+        lines = []
+        for key, instrument in self.snapshot().items():
+            lines.append(f"[{key}] bytes_out={instrument['bytes_out']} bytes_in={instrument['bytes_in']} "
+                         f"reconnects={instrument['reconnects']} downtime={instrument['downtime']:.6f}")
+            for group, label in (("ft_calls", "ft_call"), ("queries", "query")):
+                for name, h in sorted(instrument[group].items()):
+                    lines.append(f"  {label} {name} count={h['count']} mean={h['mean'] * 1e6:.1f}us "
+                                 f"p50={h['p50'] * 1e6:.1f}us p99={h['p99'] * 1e6:.1f}us max={h['max'] * 1e6:.1f}us")
+            for name, count in sorted(instrument["commands"].items()):
+                lines.append(f"  command {name} count={count}")
+            for name, count in sorted(instrument["status"].items()):
+                lines.append(f"  status {name} count={count}")
+        with open(filename, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+# Used by enable_metrics() when no registry is given, so all instruments report together.
+metrics = MetricsRegistry()
+
+
+class ScanRecord(NamedTuple):
+    """Header of one scan stored in a ScanArchive; offset is the file position of its data."""
+    serial_number: bytes
+    timestamp: float
+    points: int
+    dtype: str
+    offset: int
+
+
+class ScanArchive(object):
+    """
+    Append-only scan file. A file header is followed by scans, each a fixed header
+    (serial number, timestamp, point count, dtype) and the raw big-endian data. Scans are
+    downloaded straight into the memory-mapped file, and the index of record headers built on
+    open gives O(1) access to any scan as a zero-copy numpy.memmap view.
+    """
+
+    MAGIC = b"FTSCANAR"
+    VERSION = 1
+    _HEADER = struct.Struct("<8sH6x")
+    _RECORD = struct.Struct("<4s16sdQ8s4x")
+    _RECORD_MAGIC = b"SCAN"
+
+    __slots__ = ["filename", "readonly", "_file", "_index", "_size", "_lock"]
+
+    def __init__(self, filename: str, readonly: bool = False):
+        self.filename = filename
+        self.readonly = readonly
+        self._index = []
+        self._lock = threading.Lock()
+        exists = os.path.exists(filename) and os.path.getsize(filename) > 0
+        self._file = open(filename, "rb" if readonly else ("r+b" if exists else "w+b"))
+        if not exists:
+            self._file.write(ScanArchive._HEADER.pack(ScanArchive.MAGIC, ScanArchive.VERSION))
+            self._file.flush()
+        self._load_index()
+
+    def _load_index(self):
+        self._file.seek(0, os.SEEK_END)
+        end = self._file.tell()
+        self._file.seek(0)
+        magic, version = ScanArchive._HEADER.unpack(self._file.read(ScanArchive._HEADER.size))
+        if magic != ScanArchive.MAGIC or version != ScanArchive.VERSION:
+            self._file.close()
+            raise ValueError(f"{self.filename} is not a version {ScanArchive.VERSION} scan archive")
+        offset = ScanArchive._HEADER.size
+        while offset + ScanArchive._RECORD.size <= end:
+            self._file.seek(offset)
+            magic, serial_number, timestamp, points, dtype = ScanArchive._RECORD.unpack(
+                self._file.read(ScanArchive._RECORD.size)
+            )
+            dtype = dtype.rstrip(b"\0").decode("ascii") if magic == ScanArchive._RECORD_MAGIC else ""
+            data = offset + ScanArchive._RECORD.size
+            if not dtype or data + points * int(dtype[-1]) > end:
+                break
+            self._index.append(ScanRecord(serial_number.rstrip(b"\0"), timestamp, points, dtype, data))
+            offset = data + points * int(dtype[-1])
+        if offset < end and not self.readonly:
+            # Drop a scan whose download was interrupted before its header was committed.
+            logger.warning("Truncating %d incomplete bytes at the end of %s", end - offset, self.filename)
+            self._file.truncate(offset)
+        self._size = offset
+
+    @contextmanager
+    def writer(self, points: int, dtype: str, serial_number: bytes = b"", timestamp: float | None = None):
+        """
+        Reserves room for a scan of points values of dtype (e.g. '>f4', '>u4') at the end of the file
+        and yields a writable memoryview of its data. The scan is committed when the block exits
+        normally and cut off again when it raises. Writers are serialized.
+        """
+        if self.readonly:
+            raise IOError(f"{self.filename} is opened read-only")
+        itemsize = int(dtype[-1])
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            offset = self._size
+            data = offset + ScanArchive._RECORD.size
+            end = data + points * itemsize
+            self._file.truncate(end)
+            # mmap offsets must be aligned to the allocation granularity.
+            start = offset - offset % mmap.ALLOCATIONGRANULARITY
+            mapping = mmap.mmap(self._file.fileno(), end - start, offset=start)
+            view = memoryview(mapping)[data - start:]
+            try:
+                yield view
+                view.release()
+                # The header is written last, so a scan cut short by a crash is dropped on the next open.
+                mapping[offset - start: data - start] = ScanArchive._RECORD.pack(
+                    ScanArchive._RECORD_MAGIC, serial_number, timestamp, points, dtype.encode("ascii")
+                )
+                mapping.flush()
+            except BaseException:
+                view.release()
+                try:
+                    mapping.close()
+                except BufferError:
+                    # A view of the data is still exported, e.g. held by the traceback; the mapping
+                    # is unmapped once that goes, and the original error is the one to raise.
+                    logger.warning("Scan data still referenced, the mapping of %s stays open", self.filename)
+                try:
+                    self._file.truncate(offset)
+                except OSError as e:
+                    # The uncommitted scan is dropped by the next writer or the next open instead.
+                    logger.warning("Failed to truncate %s: %s", self.filename, e)
+                raise
+            mapping.close()
+            self._size = end
+            self._index.append(ScanRecord(serial_number, timestamp, points, dtype, data))
+
+    def append(self, data, dtype: str, serial_number: bytes = b"", timestamp: float | None = None):
+        """Stores already downloaded scan data (bytes-like, raw in dtype order). Returns the scan index."""
+        data = memoryview(data).cast("B")
+        itemsize = int(dtype[-1])
+        if data.nbytes % itemsize:
+            raise ValueError(f"The scan data length {data.nbytes} is not a multiple of the {dtype} item size")
+        with self.writer(data.nbytes // itemsize, dtype, serial_number, timestamp) as view:
+            index = len(self._index)
+            view[:] = data
+        return index
+
+    def record(self, index: int) -> ScanRecord:
+        return self._index[index]
+
+    def records(self):
+        return list(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, index: int):
+        """Returns scan index as a read-only numpy.memmap in its stored dtype."""
+        record = self._index[index]
+        numpy = Ftd2xxhelper._import_numpy()
+        if record.points == 0:
+            return numpy.empty(0, dtype=record.dtype)
+        return numpy.memmap(self.filename, dtype=record.dtype, mode="r", offset=record.offset, shape=(record.points,))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class ResponseParser(object):
+    """
+    Incremental parser of instrument responses in a receive buffer: terminator-delimited lines and
+    IEEE 488.2 definite-length blocks ('#', digit count, length, payload). feed() is called with the
+    bytes received so far and resumes where it stopped, so every byte is examined once. Terminators
+    left in front of a frame, such as the one following a block, are skipped.
+    """
+
+    __slots__ = ["_terminators", "_skip", "_start", "_scan", "_payload_start", "_payload_end", "_block", "_length",
+                 "_indefinite_length"]
+
+    def __init__(self, terminators: bytes = b"\r\n"):
+        self._terminators = [terminators[i:i + 1] for i in range(len(terminators))]
+        self._skip = frozenset(terminators)
+        self.reset()
+
+    def reset(self, indefinite_length: int | None = None):
+        """
+        Starts a new frame. With indefinite_length, a '#0' block is taken to hold that many bytes
+        instead of ending at the first terminator, for binary data that may contain CR or LF.
+        """
+        self._indefinite_length = indefinite_length
+        self._start = None
+        self._scan = 0
+        self._payload_start = None
+        self._payload_end = None
+        self._block = False
+        self._length = 0
+
+    @staticmethod
+    def block_header(data, start: int = 0, length: int | None = None):
+        """
+        Parses the block header at data[start:length]. Returns (payload offset, payload length), the
+        length being None for an indefinite-length '#0' block, or None when the header is incomplete.
+        """
+        length = len(data) if length is None else length
+        if length - start < 2:
+            return None
+        if data[start] != ord("#"):
+            raise ValueError(
+                f"The value read was supposed to contain a # symbol as the first byte, but contained '{data[start]}'"
+            )
+        b = chr(data[start + 1])
+        try:
+            val = int(b)
+        except ValueError as e:
+            raise ValueError(
+                f"The value read was supposed to contain a number as the second byte, but contained '{b}', {e}"
+            )
+        if length - start < 2 + val:
+            return None
+        if val == 0:
+            return start + 2, None
+        digits = bytes(data[start + 2: start + 2 + val])
+        if not digits.isdigit():
+            raise ValueError(f"The value read was supposed to contain a number, but contained '{digits.decode('ascii', 'replace')}'")
+        return start + 2 + val, int(digits)
+
+    def feed(self, data, length: int):
+        """Examines data[:length]; returns the end offset of the first complete frame, or -1 when more bytes are needed."""
+        self._length = length
+        if self._start is None:
+            i = self._scan
+            while i < length and data[i] in self._skip:
+                i += 1
+            self._scan = i
+            if i == length:
+                return -1
+            self._start = i
+        if self._payload_start is None:
+            start = self._start
+            if data[start] == ord("#"):
+                if length - start < 2:
+                    return -1
+                if chr(data[start + 1]).isdigit():
+                    header = ResponseParser.block_header(data, start, length)
+                    if header is None:
+                        return -1
+                    self._payload_start, size = header
+                    if size is None:
+                        size = self._indefinite_length
+                    if size is not None:
+                        self._block = True
+                        self._payload_end = self._payload_start + size
+            if self._payload_start is None:
+                self._payload_start = start
+            self._scan = self._payload_start
+        if self._block:
+            return self._payload_end if length >= self._payload_end else -1
+        ends = [end for end in (data.find(t, self._scan, length) for t in self._terminators) if end >= 0]
+        if not ends:
+            self._scan = length
+            return -1
+        self._payload_end = min(ends)
+        return self._payload_end + 1
+
+    def needed(self, length: int):
+        """Bytes still missing from a definite-length block, or 0 when the frame length is not known yet."""
+        return self._payload_end - length if self._block else 0
+
+    @property
+    def frame_start(self):
+        return self._start
+
+    @property
+    def payload(self):
+        """(start, end) offsets of the payload of the completed frame, without header and terminator."""
+        return self._payload_start, self._payload_end
+
+    @property
+    def received(self):
+        """Payload bytes received of the current frame so far."""
+        return self._length - self._payload_start if self._payload_start is not None else 0
+
+
+class BackgroundReader(object):
+    """
+    Frames the bytes drained from the device FIFO by a background thread into terminated messages.
+    Frames that arrive while no query is waiting for them are moved, with their timestamps, to
+    late_frames instead of being taken as the answer to the next query.
+    """
+
+    __slots__ = ["frames", "late_frames", "error", "_thread", "_pending", "_pending_since",
+                 "_condition", "_pause_count", "_idle", "_stopping"]
+
+    def __init__(self, late_size: int = 256):
+        self.frames = queue.Queue()
+        self.late_frames = collections.deque(maxlen=late_size)
+        self.error = None
+        self._thread = None
+        self._pending = bytearray()
+        self._pending_since = 0.0
+        self._condition = threading.Condition()
+        self._pause_count = 0
+        self._idle = False
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self):
+        return self._pause_count > 0
+
+    def start(self, target):
+        """Starts the thread running target(self); a stopped reader can be started again, keeping its pauses."""
+        with self._condition:
+            self._stopping = False
+            self._idle = False
+            self.error = None
+            if self._pending:
+                self.late_frames.append((self._pending_since, bytes(self._pending)))
+                self._pending.clear()
+        self._thread = threading.Thread(target=target, args=(self,), name="Ftd2xxhelper-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def feed(self, data, terminator: bytes):
+        """Appends received bytes and queues every completed frame, terminator included."""
+        if not self._pending:
+            self._pending_since = time.time()
+        self._pending += data
+        start = 0
+        while True:
+            end = self._pending.find(terminator, start)
+            if end < 0:
+                break
+            end += len(terminator)
+            self.frames.put((self._pending_since, bytes(self._pending[start:end])))
+            self._pending_since = time.time()
+            start = end
+        if start:
+            del self._pending[:start]
+
+    def discard_late(self):
+        """Moves the frames nobody waited for to late_frames. Returns how many were moved."""
+        moved = 0
+        while True:
+            try:
+                self.late_frames.append(self.frames.get_nowait())
+            except queue.Empty:
+                return moved
+            moved += 1
+
+    def next_frame(self, timeout: float):
+        """Returns the next frame's bytes, or None when none is completed within timeout."""
+        try:
+            return self.frames.get(timeout=timeout)[1]
+        except queue.Empty:
+            return None
+
+    def wait_while_paused(self):
+        """Called by the reader thread between reads; blocks while paused. Returns False when stopping."""
+        with self._condition:
+            while self._pause_count > 0 and not self._stopping:
+                if not self._idle:
+                    # Bytes of an unfinished frame predate the pause, so they are late as well.
+                    if self._pending:
+                        self.late_frames.append((self._pending_since, bytes(self._pending)))
+                        self._pending.clear()
+                    self._idle = True
+                    self._condition.notify_all()
+                self._condition.wait()
+            self._idle = False
+            return not self._stopping
+
+    def pause(self):
+        """Stops draining the FIFO until resume(); returns once the reader thread is idle."""
+        with self._condition:
+            self._pause_count += 1
+            while not self._idle and self.running and not self._stopping:
+                self._condition.wait(0.1)
+
+    def resume(self):
+        with self._condition:
+            self._pause_count -= 1
+            self._condition.notify_all()
+
+
+def _pauses_reader(method):
+    """Runs method with the background reader paused, as it reads from the device directly."""
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator(self, *args, **kwargs):
+            with self._reader_paused():
+                yield from method(self, *args, **kwargs)
+        return generator
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._reader_paused():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _reconnecting(method):
+    """
+    With auto-reconnect enabled, reconnects and retries method once when it failed because the
+    device handle was lost.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except IOError as e:
+            if self._reconnect_policy is None or e.errno not in Ftd2xxhelper.lost_connection_status:
+                raise
+            logger.warning("Connection lost (%s), reconnecting", e)
+            self.reconnect()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# D2XX prototypes, declared once on the shared library so ctypes does not have to infer
+# argument conversions on every call. DWORD / ULONG / FT_STATUS are 32-bit on every platform.
+_DWORD = ctypes.c_uint32
+_HANDLE = ctypes.c_void_p
+_PROTOTYPES = {
+    "FT_CreateDeviceInfoList": [ctypes.POINTER(_DWORD)],
+    "FT_GetDeviceInfoList": [ctypes.POINTER(FtNode), ctypes.POINTER(_DWORD)],
+    "FT_OpenEx": [ctypes.c_void_p, _DWORD, ctypes.POINTER(_HANDLE)],
+    "FT_Close": [_HANDLE],
+    "FT_EE_Read": [_HANDLE, ctypes.POINTER(FtProgramData)],
+    "FT_SetDataCharacteristics": [_HANDLE, ctypes.c_ubyte, ctypes.c_ubyte, ctypes.c_ubyte],
+    "FT_SetFlowControl": [_HANDLE, ctypes.c_uint16, ctypes.c_ubyte, ctypes.c_ubyte],
+    "FT_SetBaudRate": [_HANDLE, _DWORD],
+    "FT_SetTimeouts": [_HANDLE, _DWORD, _DWORD],
+    "FT_SetBitMode": [_HANDLE, ctypes.c_ubyte, ctypes.c_ubyte],
+    "FT_SetChars": [_HANDLE, ctypes.c_ubyte, ctypes.c_ubyte, ctypes.c_ubyte, ctypes.c_ubyte],
+    "FT_SetLatencyTimer": [_HANDLE, ctypes.c_ubyte],
+    "FT_SetUSBParameters": [_HANDLE, _DWORD, _DWORD],
+    "FT_Purge": [_HANDLE, _DWORD],
+    "FT_GetQueueStatus": [_HANDLE, ctypes.POINTER(_DWORD)],
+    "FT_Read": [_HANDLE, ctypes.c_void_p, _DWORD, ctypes.POINTER(_DWORD)],
+    "FT_Write": [_HANDLE, ctypes.c_void_p, _DWORD, ctypes.POINTER(_DWORD)],
+}
+
+_d2xx_library = None
+_d2xx_lock = threading.Lock()
+
+
+def _declare_prototypes(lib):
+    for name, argtypes in _PROTOTYPES.items():
+        function = getattr(lib, name)
+        function.argtypes = argtypes
+        function.restype = _DWORD
+
+
+FT_OK = 0
+FT_NOT_SUPPORTED = 17
+FT_OTHER_ERROR = 18
+FT_STATUS_NAMES = (
+    "FT_OK",
+    "FT_INVALID_HANDLE",
+    "FT_DEVICE_NOT_FOUND",
+    "FT_DEVICE_NOT_OPENED",
+    "FT_IO_ERROR",
+    "FT_INSUFFICIENT_RESOURCES",
+    "FT_INVALID_PARAMETER",
+    "FT_INVALID_BAUD_RATE",
+    "FT_DEVICE_NOT_OPENED_FOR_ERASE",
+    "FT_DEVICE_NOT_OPENED_FOR_WRITE",
+    "FT_FAILED_TO_WRITE_DEVICE",
+    "FT_EEPROM_READ_FAILED",
+    "FT_EEPROM_WRITE_FAILED",
+    "FT_EEPROM_ERASE_FAILED",
+    "FT_EEPROM_NOT_PRESENT",
+    "FT_EEPROM_NOT_PROGRAMMED",
+    "FT_INVALID_ARGS",
+    "FT_NOT_SUPPORTED",
+    "FT_OTHER_ERROR",
+)
+
+
+class PythonD2xx(object):
+    """
+    Base class for D2XX backends written in Python, such as instrument simulators.
+    Subclasses implement FT_* methods with the C signatures; as_library() exposes them as ctypes
+    function pointers with the same prototypes as libftd2xx, so the driver runs its normal call
+    paths against them. Pointer arguments arrive as ctypes pointers (use .contents) and buffers
+    as addresses. Configuration calls succeed by default, everything else is FT_NOT_SUPPORTED.
+    """
+
+    def FT_SetDataCharacteristics(self, handle, word_length, stop_bits, parity):
+        return FT_OK
+
+    def FT_SetFlowControl(self, handle, flow_control, xon, xoff):
+        return FT_OK
+
+    def FT_SetBaudRate(self, handle, baud_rate):
+        return FT_OK
+
+    def FT_SetTimeouts(self, handle, read_timeout, write_timeout):
+        return FT_OK
+
+    def FT_SetBitMode(self, handle, mask, mode):
+        return FT_OK
+
+    def FT_SetChars(self, handle, event_char, event_enabled, error_char, error_enabled):
+        return FT_OK
+
+    def FT_SetLatencyTimer(self, handle, latency):
+        return FT_OK
+
+    def FT_SetUSBParameters(self, handle, in_transfer_size, out_transfer_size):
+        return FT_OK
+
+    def as_library(self):
+        """Returns an object with one ctypes function pointer per D2XX function."""
+        library = type("PythonD2xxLibrary", (object,), {})()
+        for name, argtypes in _PROTOTYPES.items():
+            prototype = ctypes.CFUNCTYPE(_DWORD, *argtypes)
+            setattr(library, name, prototype(self._call(name)))
+        return library
+
+    def _call(self, name: str):
+        method = getattr(self, name, None)
+
+        def call(*args):
+            if method is None:
+                return FT_NOT_SUPPORTED
+            # An exception cannot cross the ctypes callback boundary, so it becomes a D2XX error status.
+            try:
+                return method(*args)
+            except Exception as e:
+                logger.error("%s failed in %s: %s", name, type(self).__name__, e)
+                return FT_OTHER_ERROR
+
+        return call
+
+
+# Trace file: a header, then one record per FT_Write / FT_Read / FT_GetQueueStatus call.
+# Record: kind, seconds since capture start, FT status, value (requested bytes for a read, queued
+# bytes for a queue status), payload length, followed by the payload (bytes written or read).
+TRACE_WRITE = 1
+TRACE_READ = 2
+TRACE_QUEUE_STATUS = 3
+_TRACE_MAGIC = b"FTD2XXTR"
+_TRACE_HEADER = struct.Struct("<8sH16s")
+_TRACE_RECORD = struct.Struct("<BdIII")
+
+
+def _deref(argument):
+    # The value behind a byref() or pointer argument.
+    if hasattr(argument, "_obj"):
+        return argument._obj.value
+    if hasattr(argument, "contents"):
+        return argument.contents.value
+    return argument.value if hasattr(argument, "value") else argument
+
+
+def read_trace(filename: str):
+    """Reads a capture file. Returns (serial number, [(kind, timestamp, status, value, payload), ...])."""
+    with open(filename, "rb") as f:
+        data = f.read()
+    magic, version, serial_number = _TRACE_HEADER.unpack_from(data, 0)
+    if magic != _TRACE_MAGIC or version != 1:
+        raise ValueError(f"Not a supported trace file: {filename}")
+    records = []
+    offset = _TRACE_HEADER.size
+    while offset + _TRACE_RECORD.size <= len(data):
+        kind, timestamp, status, value, length = _TRACE_RECORD.unpack_from(data, offset)
+        offset += _TRACE_RECORD.size
+        records.append((kind, timestamp, status, value, data[offset: offset + length]))
+        offset += length
+    return serial_number.rstrip(b"\0"), records
+
+
+class _CapturingLibrary(object):
+    """Passes D2XX calls through to library and appends the I/O calls to a trace file."""
+
+    def __init__(self, library, filename: str, serial_number: bytes | None):
+        self.library = library
+        self._file = open(filename, "wb")
+        self._file.write(_TRACE_HEADER.pack(_TRACE_MAGIC, 1, (serial_number or b"")[:16]))
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.library, name)
+
+    def _record(self, kind: int, status: int, value: int, payload: bytes = b""):
+        with self._lock:
+            self._file.write(_TRACE_RECORD.pack(kind, time.perf_counter() - self._start, status, value, len(payload)))
+            self._file.write(payload)
+
+    def FT_Write(self, handle, buffer, count, written):
+        status = self.library.FT_Write(handle, buffer, count, written)
+        self._record(TRACE_WRITE, status, 0, ctypes.string_at(buffer, _deref(written)))
+        return status
+
+    def FT_Read(self, handle, buffer, count, bytes_read):
+        status = self.library.FT_Read(handle, buffer, count, bytes_read)
+        self._record(TRACE_READ, status, count, ctypes.string_at(buffer, _deref(bytes_read)))
+        return status
+
+    def FT_GetQueueStatus(self, handle, available):
+        status = self.library.FT_GetQueueStatus(handle, available)
+        self._record(TRACE_QUEUE_STATUS, status, _deref(available))
+        return status
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class _InstrumentedLibrary(object):
+    """Passes D2XX calls through to library, timing each one and counting bytes and status codes."""
+
+    def __init__(self, library, registry: MetricsRegistry, serial_number: bytes | None):
+        self.library = library
+        self.registry = registry
+        self.serial_number = serial_number or b""
+
+    def __getattr__(self, name):
+        function = getattr(self.library, name)
+        if not name.startswith("FT_"):
+            return function
+
+        def timed(*args):
+            start = time.perf_counter()
+            # Looked up per call, as the layer below may change when a capture is stopped.
+            status = getattr(self.library, name)(*args)
+            self.registry.record_call(self.serial_number, name, time.perf_counter() - start, status)
+            return status
+
+        # Cached on the instance, so __getattr__ only runs on the first call of each function.
+        setattr(self, name, timed)
+        return timed
+
+    def FT_Write(self, handle, buffer, count, written):
+        start = time.perf_counter()
+        status = self.library.FT_Write(handle, buffer, count, written)
+        self.registry.record_call(self.serial_number, "FT_Write", time.perf_counter() - start, status,
+                                  sent=_deref(written))
+        return status
+
+    def FT_Read(self, handle, buffer, count, bytes_read):
+        start = time.perf_counter()
+        status = self.library.FT_Read(handle, buffer, count, bytes_read)
+        self.registry.record_call(self.serial_number, "FT_Read", time.perf_counter() - start, status,
+                                  received=_deref(bytes_read))
+        return status
+
+
+class ReplayD2xx(PythonD2xx):
+    """
+    D2XX backend that replays a capture file through the driver's normal code paths.
+    Each recorded write is answered with the bytes that were read after it, made available at
+    their recorded delays (realtime) or immediately (as fast as possible). Replies are tied to
+    writes rather than to individual read calls, so a changed read loop can be replayed too.
+    """
+
+    def __init__(self, filename: str, realtime: bool = True):
+        self.serial_number, records = read_trace(filename)
+        self.realtime = realtime
+        self.exchanges = []  # (bytes written, [(delay after the write, bytes read), ...])
+        self.mismatches = 0
+        self.rx = bytearray()
+        self.scheduled = []
+        self.read_timeout = 1.0
+        self._cursor = 0
+        self._lock = threading.Lock()
+        written_at = 0.0
+        replies = []
+        for kind, timestamp, status, value, payload in records:
+            if kind == TRACE_WRITE:
+                replies = []
+                written_at = timestamp
+                self.exchanges.append((payload, replies))
+            elif kind == TRACE_READ and payload:
+                if not self.exchanges:
+                    self.exchanges.append((b"", replies))
+                replies.append((timestamp - written_at, payload))
+        # Bytes that were read before the first write are pending when the replay starts.
+        if self.exchanges and self.exchanges[0][0] == b"":
+            self._schedule(self.exchanges[0][1])
+            self._cursor = 1
+
+    def _schedule(self, replies):
+        now = time.monotonic()
+        for delay, payload in replies:
+            self.scheduled.append((now + delay if self.realtime else now, payload))
+
+    def _arrived(self):
+        now = time.monotonic()
+        with self._lock:
+            while self.scheduled and self.scheduled[0][0] <= now:
+                self.rx += self.scheduled.pop(0)[1]
+            return len(self.rx)
+
+    def FT_CreateDeviceInfoList(self, num_devices):
+        num_devices.contents.value = 1
+        return FT_OK
+
+    def FT_GetDeviceInfoList(self, nodes, num_devices):
+        nodes[0].SerialNumber = self.serial_number
+        nodes[0].Description = b"SANTEC REPLAY"
+        num_devices.contents.value = 1
+        return FT_OK
+
+    def FT_OpenEx(self, argument, flags, handle):
+        handle.contents.value = 1
+        return FT_OK
+
+    def FT_Close(self, handle):
+        return FT_OK
+
+    def FT_EE_Read(self, handle, program_data):
+        ctypes.memmove(program_data.contents.Manufacturer, b"SANTEC\0", 7)
+        return FT_OK
+
+    def FT_SetTimeouts(self, handle, read_timeout, write_timeout):
+        self.read_timeout = read_timeout / 1000.0
+        return FT_OK
+
+    def FT_Purge(self, handle, mask):
+        with self._lock:
+            self.rx.clear()
+            self.scheduled.clear()
+        return FT_OK
+
+    def FT_Write(self, handle, buffer, count, bytes_written):
+        data = ctypes.string_at(buffer, count)
+        if self._cursor < len(self.exchanges):
+            recorded, replies = self.exchanges[self._cursor]
+            self._cursor += 1
+            if recorded != data:
+                self.mismatches += 1
+                logger.warning("Replay write mismatch, recorded: %r, written: %r", recorded, data)
+            with self._lock:
+                self._schedule(replies)
+        bytes_written.contents.value = count
+        return FT_OK
+
+    def FT_GetQueueStatus(self, handle, available):
+        available.contents.value = self._arrived()
+        return FT_OK
+
+    def FT_Read(self, handle, buffer, count, bytes_read):
+        deadline = time.monotonic() + self.read_timeout
+        while self._arrived() < count and self.scheduled and time.monotonic() < deadline:
+            time.sleep(0.0002)
+        with self._lock:
+            n = min(count, len(self.rx))
+            ctypes.memmove(buffer, bytes(self.rx[:n]), n)
+            del self.rx[:n]
+        bytes_read.contents.value = n
+        return FT_OK
+
+
 class Ftd2xxhelper(object):
     terminator = "\r"
+    read_modes = ("poll", "event")
+    event_read_timeout_ms = 50
+    max_batch_size = 4096
+    # FT_INVALID_HANDLE, FT_DEVICE_NOT_FOUND, FT_DEVICE_NOT_OPENED, FT_IO_ERROR, FT_OTHER_ERROR
+    lost_connection_status = (1, 2, 3, 4, 18)
 
     __slots__ = [
         "_selected_device_node",
@@ -68,133 +1399,266 @@ class Ftd2xxhelper(object):
         "_ft_handle",
         "_num_devices",
         "_ftdi_device_list",
-        "_d2xx"
+        "_d2xx",
+        "_read_mode",
+        "_rx_buffer",
+        "_rx_address",
+        "_available",
+        "_bytes_read",
+        "_frame_ring",
+        "_link_profile",
+        "_timing",
+        "_query_cache",
+        "_capture",
+        "_reader",
+        "_configured",
+        "_reconnect_policy",
+        "_reconnects",
+        "_downtime",
+        "_parser",
+        "_rx_surplus",
+        "_metrics"
     ]
 
-    def __init__(self, serial_number: str | bytes | None = None):
-        logging.info(f"Ftd2xxhelper class initialized. Serial number: {serial_number}")
+    def __init__(self, serial_number: str | bytes | None = None, read_mode: str = "poll",
+                 link_profile: str | LinkProfile = "compat", location_id: int | None = None, direct: bool = False):
+        logger.info(f"Ftd2xxhelper class initialized. Serial number: {serial_number}, read mode: {read_mode}")
+        if read_mode not in self.read_modes:
+            raise ValueError(f"Unknown read mode '{read_mode}', expected one of {self.read_modes}")
         self._selected_device_node = None
         self._last_connected_serial_number = None
         self._ft_handle = None
         self._num_devices = None
         self._ftdi_device_list = None
         self._d2xx = None
-        logging.info("Ftd2xxhelper class properties set to None.")
+        self._read_mode = read_mode
+        self._rx_buffer = None
+        self._rx_address = None
+        self._available = ctypes.c_uint32()
+        self._bytes_read = ctypes.c_uint32()
+        self._frame_ring = None
+        self._link_profile = Ftd2xxhelper._resolve_link_profile(link_profile)
+        self._timing = None
+        self._query_cache = None
+        self._capture = None
+        self._reader = None
+        self._configured = False
+        self._reconnect_policy = None
+        self._reconnects = 0
+        self._downtime = 0.0
+        self._parser = None
+        self._rx_surplus = b""
+        self._metrics = None
+        logger.info("Ftd2xxhelper class properties set to None.")
 
         self._d2xx = self.load_library()
-        # logging.info(f"Loaded library: {self._d2xx}.")
-        if serial_number is not None:
+        # logger.info(f"Loaded library: {self._d2xx}.")
+        if direct or location_id is not None:
+            # Opens by serial number or location ID, scanning the device list only when that fails.
+            self.open_direct(serial_number, location_id)
+        elif serial_number is not None:
             self.initialize(serial_number)
 
     @staticmethod
-    def load_library():
-        """Loads the FTDI D2XX library based on OS."""
-        logging.info("Loading FTDI library")
-        try:
-            if sys.platform.startswith("linux"):
-                lib_name = "libftd2xx.so"
-            elif sys.platform.startswith("darwin"):
-                lib_name = "libftd2xx.dylib"
-            else:
-                lib_name = "ftd2xx"
+    def set_library(library):
+        """
+        Replaces the process-wide D2XX library, e.g. with PythonD2xx.as_library(). Instances created
+        afterwards, and list_devices(), use it. None reloads the real library on the next use.
+        """
+        global _d2xx_library
+        logger.info("Set library: %s", library)
+        with _d2xx_lock:
+            _d2xx_library = library
 
-            logging.info(f"Attempting to load: {lib_name}")
-            return ctypes.cdll.LoadLibrary(lib_name) \
-                if sys.platform.startswith("linux") or sys.platform.startswith("darwin") \
-                else ctypes.windll.LoadLibrary(lib_name)
-        except OSError as e:
-            logging.error(f"Failed to load FTDI library: {e}")
-            raise RuntimeError(f"Failed to load FTDI library: {e}")
+    @staticmethod
+    def load_library():
+        """Loads the FTDI D2XX library based on OS, once per process."""
+        global _d2xx_library
+        if _d2xx_library is not None:
+            return _d2xx_library
+
+        with _d2xx_lock:
+            if _d2xx_library is not None:
+                return _d2xx_library
+            logger.info("Loading FTDI library")
+            try:
+                if sys.platform.startswith("linux"):
+                    lib_name = "libftd2xx.so"
+                elif sys.platform.startswith("darwin"):
+                    lib_name = "libftd2xx.dylib"
+                else:
+                    lib_name = "ftd2xx"
+
+                logger.info(f"Attempting to load: {lib_name}")
+                lib = ctypes.cdll.LoadLibrary(lib_name) \
+                    if sys.platform.startswith("linux") or sys.platform.startswith("darwin") \
+                    else ctypes.windll.LoadLibrary(lib_name)
+                _declare_prototypes(lib)
+            except (OSError, AttributeError) as e:
+                logger.error(f"Failed to load FTDI library: {e}")
+                raise RuntimeError(f"Failed to load FTDI library: {e}")
+            _d2xx_library = lib
+            return lib
 
     @staticmethod
-    def list_devices():
-        """Lists connected FTDI devices and filters by manufacturer 'SANTEC'."""
-        logging.info("Listing FTDI devices...")
+    def list_devices(parallel: bool = False, max_workers: int = 8, probe_timeout: float = 5.0):
+        """
+        Lists connected FTDI devices and filters by manufacturer 'SANTEC'.
+        With parallel, devices that are not in the probe cache are probed concurrently on up to
+        max_workers threads, and a device whose probe has not finished probe_timeout seconds after the
+        probing started is skipped.
+        """
+        logger.info(f"Listing FTDI devices, parallel: {parallel}")
         try:
             d2xx = Ftd2xxhelper.load_library()
         except RuntimeError as e:
-            logging.error(f"Library load failed: {e}")
+            logger.error(f"Library load failed: {e}")
             return []
 
-        numDevs = ctypes.c_long()
+        numDevs = ctypes.c_uint32()
         if d2xx.FT_CreateDeviceInfoList(ctypes.byref(numDevs)) != 0:
-            logging.error("Failed to create FTDI device list")
+            logger.error("Failed to create FTDI device list")
             return []
 
-        logging.info(f"Number of FTDI devices detected: {numDevs.value}")
+        logger.info(f"Number of FTDI devices detected: {numDevs.value}")
         if numDevs.value <= 0:
             return []
 
         t_devices = FtNode * numDevs.value
         devices = t_devices()
         if d2xx.FT_GetDeviceInfoList(devices, ctypes.byref(numDevs)) != 0:
-            logging.error("Failed to retrieve FTDI device list")
+            logger.error("Failed to retrieve FTDI device list")
             return []
 
+        probe_cache.retain(devices)
+        device_registry.update(devices)
+        manufacturers = {}
+        unknown = []
+        for index, device in enumerate(devices):
+            manufacturer_name = probe_cache.get(device.SerialNumber, device.LocId)
+            if manufacturer_name is None:
+                unknown.append((index, device))
+            else:
+                manufacturers[index] = manufacturer_name
+
+        if parallel and len(unknown) > 1:
+            probed = Ftd2xxhelper._probe_concurrently(d2xx, unknown, max_workers, probe_timeout)
+        else:
+            probed = {index: Ftd2xxhelper._probe_manufacturer(d2xx, device) for index, device in unknown}
+        for index, device in unknown:
+            if probed.get(index) is not None:
+                manufacturers[index] = probed[index]
+                probe_cache.put(device.SerialNumber, device.LocId, probed[index])
+
         ftdiDeviceList = []
-        for device in devices:
-            ftHandle = ctypes.c_void_p()
-            if d2xx.FT_OpenEx(device.SerialNumber, 1, ctypes.byref(ftHandle)) != 0:
-                logging.error(f"Failed to open FTDI device: {device.SerialNumber}")
-                continue
-
-            eeprom = FtProgramData()
-            eeprom.Signature1 = 0x00000000
-            eeprom.Signature2 = 0xFFFFFFFF
-            eeprom.Version = 2
-            eeprom.Manufacturer = ctypes.create_string_buffer(32)
-            eeprom.ManufacturerId = ctypes.create_string_buffer(16)
-            eeprom.Description = ctypes.create_string_buffer(64)
-            eeprom.SerialNumber = ctypes.create_string_buffer(16)
+        for index, device in enumerate(devices):
+            manufacturer_name = manufacturers.get(index)
+            logger.info(f"Manufacturer: {manufacturer_name}")
+            if manufacturer_name == "SANTEC":
+                ftdiDeviceList.append(device)
 
-            try:
-                if d2xx.FT_EE_Read(ftHandle, ctypes.byref(eeprom)) == 0:
-                    manufacturer = ctypes.cast(eeprom.Manufacturer, ctypes.c_char_p).value
-                    if manufacturer:
-                        manufacturer_name = manufacturer.decode("ascii", errors="ignore").upper()
-                        logging.info(f"Manufacturer: {manufacturer_name}")
-                        if manufacturer_name == "SANTEC":
-                            ftdiDeviceList.append(device)
-            finally:
-                d2xx.FT_Close(ftHandle)
-
-        logging.info(f"Filtered FTDI device list: {ftdiDeviceList}")
+        logger.info(f"Filtered FTDI device list: {ftdiDeviceList}")
         return ftdiDeviceList
 
+    @staticmethod
+    def invalidate_probe_cache(serial_number: bytes | None = None):
+        """Forgets the cached manufacturer of a device, or of every device, so it is probed again."""
+        logger.info(f"Invalidate probe cache, serial number: {serial_number}")
+        probe_cache.invalidate(serial_number)
+
+    @staticmethod
+    def _new_program_data():
+        eeprom = FtProgramData()
+        eeprom.Signature1 = 0x00000000
+        eeprom.Signature2 = 0xFFFFFFFF
+        eeprom.Version = 2
+        eeprom.Manufacturer = ctypes.create_string_buffer(32)
+        eeprom.ManufacturerId = ctypes.create_string_buffer(16)
+        eeprom.Description = ctypes.create_string_buffer(64)
+        eeprom.SerialNumber = ctypes.create_string_buffer(16)
+        return eeprom
+
+    @staticmethod
+    def _probe_manufacturer(d2xx, device: FtNode):
+        """Opens the device, reads the manufacturer from its EEPROM and closes it again."""
+        ftHandle = ctypes.c_void_p()
+        if d2xx.FT_OpenEx(device.SerialNumber, 1, ctypes.byref(ftHandle)) != 0:
+            logger.error(f"Failed to open FTDI device: {device.SerialNumber}")
+            return None
+
+        eeprom = Ftd2xxhelper._new_program_data()
+        try:
+            if d2xx.FT_EE_Read(ftHandle, ctypes.byref(eeprom)) != 0:
+                logger.error(f"Failed to read EEPROM of FTDI device: {device.SerialNumber}")
+                return None
+            manufacturer = ctypes.cast(eeprom.Manufacturer, ctypes.c_char_p).value
+            return manufacturer.decode("ascii", errors="ignore").upper() if manufacturer else ""
+        finally:
+            d2xx.FT_Close(ftHandle)
+
+    @staticmethod
+    def _probe_concurrently(d2xx, devices, max_workers: int, probe_timeout: float):
+        """
+        Probes (index, device) pairs on up to max_workers threads; returns {index: manufacturer} for
+        the probes that finished within probe_timeout seconds of the start, queued ones included.
+        """
+        work = queue.Queue()
+        for item in devices:
+            work.put(item)
+        finished = queue.Queue()
+
+        def probe():
+            while True:
+                try:
+                    index, device = work.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    finished.put((index, Ftd2xxhelper._probe_manufacturer(d2xx, device)))
+                except Exception as e:
+                    logger.error("Failed to probe FTDI device: %s, %s", device.SerialNumber, e)
+                    finished.put((index, None))
+
+        # The D2XX calls release the GIL, so the USB control transfers of different adapters overlap.
+        # The workers are daemon threads: one stuck in the driver on a wedged adapter is abandoned,
+        # and does not keep the interpreter from exiting.
+        deadline = time.monotonic() + probe_timeout
+        for _ in range(min(max_workers, len(devices))):
+            threading.Thread(target=probe, name="ftd2xx-probe", daemon=True).start()
+        results = {}
+        for _ in range(len(devices)):
+            try:
+                index, manufacturer = finished.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            results[index] = manufacturer
+        # Probes that have not started are dropped, so the workers end after their current probe.
+        while True:
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                break
+        for index, device in devices:
+            if index not in results:
+                logger.error("Timed out probing FTDI device: %s", device.SerialNumber)
+        return {index: manufacturer for index, manufacturer in results.items() if manufacturer is not None}
+
     @staticmethod
     def __check(f):
-        logging.info(f"Performing check: {f}")
+        logger.debug("Performing check: %s", f)
         if f != 0:
-            names = [
-                "FT_OK",
-                "FT_INVALID_HANDLE",
-                "FT_DEVICE_NOT_FOUND",
-                "FT_DEVICE_NOT_OPENED",
-                "FT_IO_ERROR",
-                "FT_INSUFFICIENT_RESOURCES",
-                "FT_INVALID_PARAMETER",
-                "FT_INVALID_BAUD_RATE",
-                "FT_DEVICE_NOT_OPENED_FOR_ERASE",
-                "FT_DEVICE_NOT_OPENED_FOR_WRITE",
-                "FT_FAILED_TO_WRITE_DEVICE",
-                "FT_EEPROM_READ_FAILED",
-                "FT_EEPROM_WRITE_FAILED",
-                "FT_EEPROM_ERASE_FAILED",
-                "FT_EEPROM_NOT_PRESENT",
-                "FT_EEPROM_NOT_PROGRAMMED",
-                "FT_INVALID_ARGS",
-                "FT_NOT_SUPPORTED",
-                "FT_OTHER_ERROR",
-            ]
-            logging.error("Error: (status %d: %s)" % (f, names[f]))
-            raise IOError("Error: (status %d: %s)" % (f, names[f]))
+            names = FT_STATUS_NAMES
+            logger.error("Error: (status %d: %s)" % (f, names[f]))
+            error = IOError("Error: (status %d: %s)" % (f, names[f]))
+            error.errno = f
+            raise error
 
     def get_dev_info_list(self) -> Array[FtNode] | list[Any]:
-        logging.info("Getting device info list.")
-        numDevs = ctypes.c_long()
+        logger.info("Getting device info list.")
+        numDevs = ctypes.c_uint32()
         Ftd2xxhelper.__check(self._d2xx.FT_CreateDeviceInfoList(ctypes.byref(numDevs)))
         self._num_devices = numDevs.value
-        logging.info(f"numDevs value: {self._num_devices}")
+        logger.info(f"numDevs value: {self._num_devices}")
         if numDevs.value > 0:
             t_devices = FtNode * numDevs.value
             devices = t_devices()
@@ -202,66 +1666,58 @@ class Ftd2xxhelper(object):
                 self._d2xx.FT_GetDeviceInfoList(devices, ctypes.byref(numDevs))
             )
             self._ftdi_device_list = devices
-            logging.info(f"Device info list: {devices}")
+            probe_cache.retain(devices)
+            device_registry.update(devices)
+            logger.info(f"Device info list: {devices}")
             return devices
         else:
-            logging.info(f"Returning empty device info list.")
+            probe_cache.retain([])
+            device_registry.update([])
+            logger.info(f"Returning empty device info list.")
             return []
 
     def eeprom_data(self):
-        logging.info("Eeprom data method.")
-        # logging.info(f"Selected device node: {self._selected_device_node}")
+        logger.info("Eeprom data method.")
+        # logger.info(f"Selected device node: {self._selected_device_node}")
         if self._selected_device_node is None:
             return None
 
-        eeprom = FtProgramData()
-        eeprom.Signature1 = 0x00000000
-        eeprom.Signature2 = 0xFFFFFFFF
-        eeprom.Version = 2
-        eeprom.Manufacturer = ctypes.create_string_buffer(32)
-        eeprom.ManufacturerId = ctypes.create_string_buffer(16)
-        eeprom.Description = ctypes.create_string_buffer(64)
-        eeprom.SerialNumber = ctypes.create_string_buffer(16)
-        # logging.info(f"Eeprom: {eeprom}")
+        eeprom = Ftd2xxhelper._new_program_data()
+        # logger.info(f"Eeprom: {eeprom}")
 
         try:
             Ftd2xxhelper.__check(
                 self._d2xx.FT_EE_Read(self._ft_handle, ctypes.byref(eeprom))
             )
-            # logging.info(f"Eeprom: {eeprom}")
+            # logger.info(f"Eeprom: {eeprom}")
             return eeprom
         except Exception as e:
-            logging.error(f"Exception, {e}")
+            logger.error(f"Exception, {e}")
             return None
 
-    def initialize(self, serialNumber: str | bytes | None = None):
-        logging.info(f"Initializing device, Serial number: {serialNumber}")
+    def initialize(self, serialNumber: str | bytes | None = None, location_id: int | None = None):
+        logger.info(f"Initializing device, Serial number: {serialNumber}, location ID: {location_id}")
         devs = self.get_dev_info_list()
-        logging.info(f"Devices len: {len(devs)}, devices: {devs}")
-
-        self._selected_device_node = None
-        self._last_connected_serial_number = None
-
-        if serialNumber is None:
-            for dev in devs:
-                if dev.Description.decode("ascii").startswith("SANTEC"):
-                    self._selected_device_node = dev
-                    self._last_connected_serial_number = dev.SerialNumber
-                    break
+        logger.info(f"Devices len: {len(devs)}, devices: {devs}")
+
+        # The indexes of this enumeration, even if another enumeration replaces them meanwhile.
+        registry = device_registry.snapshot()
+        if location_id is not None:
+            node = registry.by_location(location_id)
+        elif serialNumber is None:
+            node = registry.first("SANTEC")
         else:
-            for dev in devs:
-                if (
-                        dev.SerialNumber == serialNumber
-                        or dev.SerialNumber.decode("ascii") == serialNumber
-                ):
-                    self._selected_device_node = dev
-                    self._last_connected_serial_number = dev.SerialNumber
-                    break
+            node = registry.by_serial(serialNumber)
+        self._selected_device_node = node
+        self._last_connected_serial_number = node.SerialNumber if node is not None else None
         if self._selected_device_node is None:
+            if location_id is not None:
+                logger.error(f"Value error, Failed to open device by location ID {location_id:#x}")
+                raise ValueError(f"Failed to open device by location ID {location_id:#x}")
             if serialNumber is None:
-                logging.error("Value error, Failed to find Santec instruments")
+                logger.error("Value error, Failed to find Santec instruments")
                 raise ValueError("Failed to find Santec instruments")
-            logging.error(f"Value error, Failed to open device by serial number '{serialNumber}'")
+            logger.error(f"Value error, Failed to open device by serial number '{serialNumber}'")
             raise ValueError(f"Failed to open device by serial number '{serialNumber}'")
         self._ft_handle = ctypes.c_void_p()
         Ftd2xxhelper.__check(
@@ -270,23 +1726,76 @@ class Ftd2xxhelper(object):
             )
         )
 
-        eeprom = self.eeprom_data()
-        # logging.info(f"Eeprom: {eeprom}")
-        if eeprom is None:
-            logging.error(f"Run time error, Failed to retrieve EEPROM data from the device "
-                          f"(SN: {self._last_connected_serial_number}, "
-                          f"Description: {self._selected_device_node.Description})")
-            raise RuntimeError(
-                f"Failed to retrieve EEPROM data from the device (SN: {self._last_connected_serial_number}, "
-                f"Description: {self._selected_device_node.Description})"
-            )
-        manufacturer = ctypes.cast(eeprom.Manufacturer, ctypes.c_char_p)
-        if manufacturer.value.decode("ascii").upper() == "SANTEC":
+        location_id = self._selected_device_node.LocId
+        manufacturer_name = probe_cache.get(self._last_connected_serial_number, location_id)
+        if manufacturer_name is None:
+            eeprom = self.eeprom_data()
+            # logger.info(f"Eeprom: {eeprom}")
+            if eeprom is None:
+                logger.error(f"Run time error, Failed to retrieve EEPROM data from the device "
+                              f"(SN: {self._last_connected_serial_number}, "
+                              f"Description: {self._selected_device_node.Description})")
+                raise RuntimeError(
+                    f"Failed to retrieve EEPROM data from the device (SN: {self._last_connected_serial_number}, "
+                    f"Description: {self._selected_device_node.Description})"
+                )
+            manufacturer = ctypes.cast(eeprom.Manufacturer, ctypes.c_char_p)
+            manufacturer_name = manufacturer.value.decode("ascii").upper()
+            probe_cache.put(self._last_connected_serial_number, location_id, manufacturer_name)
+        if manufacturer_name == "SANTEC":
             self._initialize()
-        logging.info("\nInitialization done.")
+        logger.info("\nInitialization done.")
+
+    def open_direct(self, serial_number: str | bytes | None = None, location_id: int | None = None):
+        """
+        Opens the device with FT_OpenEx by serial number or location ID, without enumerating the
+        devices. The EEPROM manufacturer check is done on the first open and trusted from the probe
+        cache afterwards. Falls back to initialize() and its full device scan when the open fails.
+        """
+        logger.info("Open direct, serial number: %s, location ID: %s", serial_number, location_id)
+        if serial_number is None and location_id is None:
+            raise ValueError("A serial number or a location ID is required to open a device directly")
+        serial = DeviceRegistry._bytes(serial_number) if serial_number is not None else None
+        node = device_registry.by_serial(serial) if serial is not None else device_registry.by_location(location_id)
+
+        handle = ctypes.c_void_p()
+        if serial is not None:
+            status = self._d2xx.FT_OpenEx(serial, 1, ctypes.byref(handle))
+        else:
+            status = self._d2xx.FT_OpenEx(location_id, 4, ctypes.byref(handle))
+        if status != FT_OK:
+            logger.warning("Direct open failed (status %s), scanning the device list", status)
+            return self.initialize(serial_number, None if serial is not None else location_id)
+
+        manufacturer_name = probe_cache.get(node.SerialNumber, node.LocId) if node is not None else None
+        if manufacturer_name is None:
+            eeprom = Ftd2xxhelper._new_program_data()
+            if self._d2xx.FT_EE_Read(handle, ctypes.byref(eeprom)) != FT_OK:
+                self._d2xx.FT_Close(handle)
+                logger.error("Run time error, Failed to retrieve EEPROM data from the device "
+                             "(SN: %s, location ID: %s)", serial_number, location_id)
+                raise RuntimeError(
+                    f"Failed to retrieve EEPROM data from the device (SN: {serial_number}, location ID: {location_id})"
+                )
+            manufacturer_name = ctypes.cast(eeprom.Manufacturer, ctypes.c_char_p).value.decode("ascii").upper()
+            if node is None:
+                # Not enumerated yet: remember what the EEPROM says, so the next open is trusted.
+                node = FtNode()
+                node.SerialNumber = serial or ctypes.cast(eeprom.SerialNumber, ctypes.c_char_p).value
+                node.Description = ctypes.cast(eeprom.Description, ctypes.c_char_p).value
+                node.LocId = location_id or 0
+                node = device_registry.add(node)
+            probe_cache.put(node.SerialNumber, node.LocId, manufacturer_name)
+
+        self._ft_handle = handle
+        self._selected_device_node = node
+        self._last_connected_serial_number = node.SerialNumber
+        if manufacturer_name == "SANTEC":
+            self._initialize()
+        logger.info("Direct open done.")
 
     def _initialize(self):
-        logging.info("Start _initialize operation.")
+        logger.info("Start _initialize operation.")
         word_len = ctypes.c_ubyte(8)
         stop_bits = ctypes.c_ubyte(0)
         parity = ctypes.c_ubyte(0)
@@ -301,143 +1810,771 @@ class Ftd2xxhelper(object):
         Ftd2xxhelper.__check(
             self._d2xx.FT_SetFlowControl(self._ft_handle, flowControl, xon, x_off)
         )
-        baud_rate = ctypes.c_uint64(9600)
-        Ftd2xxhelper.__check(self._d2xx.FT_SetBaudRate(self._ft_handle, baud_rate))
-        timeout = ctypes.c_uint64(1000)
-        Ftd2xxhelper.__check(self._d2xx.FT_SetTimeouts(self._ft_handle, timeout, timeout))
+        self._apply_link_profile()
         mask = ctypes.c_ubyte(0x00)
         enable = ctypes.c_ubyte(0x40)
         Ftd2xxhelper.__check(self._d2xx.FT_SetBitMode(self._ft_handle, mask, enable))
-        logging.info("_initialize operation done.")
+        if self._read_mode == "event":
+            self._apply_read_mode()
+        self._configured = True
+        logger.info("_initialize operation done.")
+
+    def enable_frame_ring(self, size: int = 256):
+        """Starts keeping the last size TX / RX frames of this instance in memory."""
+        self._frame_ring = FrameRing(size)
+        return self._frame_ring
+
+    def disable_frame_ring(self):
+        self._frame_ring = None
+
+    def dump_frames(self, filename: str):
+        """Appends the recorded TX / RX frames to filename, e.g. after a failed transfer."""
+        if self._frame_ring is not None:
+            self._frame_ring.dump(filename)
+
+    def set_read_mode(self, mode: str):
+        """Selects how query() waits for a response: 'poll' (fixed sleep loop) or 'event' (returns on terminator)."""
+        logger.info(f"Set read mode: {mode}")
+        if mode not in self.read_modes:
+            raise ValueError(f"Unknown read mode '{mode}', expected one of {self.read_modes}")
+        self._read_mode = mode
+        if self._ft_handle is not None:
+            self._apply_read_mode()
+
+    def _apply_read_mode(self):
+        # In event mode the terminator is programmed as the FTDI event character, so the chip
+        # flushes the response as soon as it sees it instead of waiting for the latency timer,
+        # and a short read timeout lets FT_Read block for the first byte without a sleep floor.
+        if self._reader is not None:
+            # A running background reader keeps its own event character and short read timeout.
+            self._apply_reader_settings()
+            return
+        event = self._read_mode == "event"
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_SetChars(
+                self._ft_handle,
+                ctypes.c_ubyte(ord(self.terminator)),
+                ctypes.c_ubyte(1 if event else 0),
+                ctypes.c_ubyte(0),
+                ctypes.c_ubyte(0),
+            )
+        )
+        self._apply_timeouts()
+
+    def _apply_timeouts(self):
+        profile = self._link_profile
+        read_timeout = ctypes.c_uint32(
+            self.event_read_timeout_ms if self._read_mode == "event" or self._reader is not None else profile.read_timeout
+        )
+        write_timeout = ctypes.c_uint32(profile.write_timeout)
+        Ftd2xxhelper.__check(self._d2xx.FT_SetTimeouts(self._ft_handle, read_timeout, write_timeout))
+
+    @staticmethod
+    def _resolve_link_profile(profile: str | LinkProfile):
+        if isinstance(profile, LinkProfile):
+            return profile
+        try:
+            return LINK_PROFILES[profile]
+        except KeyError:
+            raise ValueError(f"Unknown link profile '{profile}', expected one of {list(LINK_PROFILES)}")
+
+    @property
+    def link_profile(self) -> LinkProfile:
+        return self._link_profile
+
+    def set_link_profile(self, profile: str | LinkProfile):
+        """
+        Selects the baud rate, latency timer, USB transfer sizes and timeouts, by name from
+        LINK_PROFILES ('compat', 'low-latency', 'bulk') or as a LinkProfile. Applied immediately
+        when the device is open.
+        """
+        logger.info("Set link profile: %s", profile)
+        self._link_profile = Ftd2xxhelper._resolve_link_profile(profile)
+        if self._ft_handle is not None:
+            self._apply_link_profile()
+
+    @contextmanager
+    def using_link_profile(self, profile: str | LinkProfile):
+        """Switches to profile for the duration of a with block, e.g. 'bulk' around a scan download."""
+        previous = self._link_profile
+        self.set_link_profile(profile)
+        try:
+            yield self
+        finally:
+            self.set_link_profile(previous)
+
+    def _apply_link_profile(self):
+        profile = self._link_profile
+        Ftd2xxhelper.__check(self._d2xx.FT_SetBaudRate(self._ft_handle, ctypes.c_uint32(profile.baud_rate)))
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_SetLatencyTimer(self._ft_handle, ctypes.c_ubyte(profile.latency_timer))
+        )
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_SetUSBParameters(
+                self._ft_handle, ctypes.c_uint32(profile.in_transfer_size), ctypes.c_uint32(profile.out_transfer_size)
+            )
+        )
+        self._apply_timeouts()
 
     def open_usb_connection(self):
-        logging.info("Open USB connection.")
-        self.initialize()
+        """
+        Opens the connection. Once a device was connected, its handle is reopened by serial number
+        with the same configuration, without enumerating the devices again.
+        """
+        logger.info("Open USB connection.")
+        if self._last_connected_serial_number is None:
+            self.initialize()
+        else:
+            self._ensure_open()
+
+    def _ensure_open(self):
+        if self._ft_handle is None:
+            self._reopen()
+
+    def _reopen(self):
+        # The identity and the manufacturer check were established by initialize(), so the device is
+        # opened directly and only the link configuration is applied again.
+        handle = ctypes.c_void_p()
+        if self._last_connected_serial_number or self._selected_device_node is None:
+            Ftd2xxhelper.__check(
+                self._d2xx.FT_OpenEx(self._last_connected_serial_number, 1, ctypes.byref(handle))
+            )
+        else:
+            # Opened by location ID and the EEPROM holds no serial number.
+            Ftd2xxhelper.__check(
+                self._d2xx.FT_OpenEx(self._selected_device_node.LocId, 4, ctypes.byref(handle))
+            )
+        self._ft_handle = handle
+        if self._configured:
+            self._initialize()
+
+    def is_alive(self):
+        """Cheap health check: True when the handle is open and the driver still answers for it."""
+        if self._ft_handle is None:
+            return False
+        available = ctypes.c_uint32()
+        return self._d2xx.FT_GetQueueStatus(self._ft_handle, ctypes.byref(available)) == FT_OK
+
+    def enable_auto_reconnect(self, policy: ReconnectPolicy | None = None):
+        """Makes write(), query() and the batch methods reconnect and retry once when the handle is lost."""
+        self._reconnect_policy = policy or ReconnectPolicy()
+
+    def disable_auto_reconnect(self):
+        self._reconnect_policy = None
+
+    def reconnect(self):
+        """
+        Closes the handle and reopens the same device with the same configuration, retrying with
+        the bounded backoff of the reconnect policy. A running background reader is restarted.
+        Returns the downtime in seconds.
+        """
+        policy = self._reconnect_policy or ReconnectPolicy()
+        start = time.monotonic()
+        # The reader is restarted rather than replaced, so a caller that paused it stays undisturbed.
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.stop()
+        self.close_usb_connection()
+        delay = policy.initial_delay
+        for attempt in range(1, policy.attempts + 1):
+            try:
+                self._reopen()
+                break
+            except IOError as e:
+                logger.warning("Reconnect attempt %d of %d failed: %s", attempt, policy.attempts, e)
+                self.close_usb_connection()
+                if attempt == policy.attempts:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * policy.factor, policy.max_delay)
+        downtime = time.monotonic() - start
+        self._reconnects += 1
+        self._downtime += downtime
+        if self._metrics is not None:
+            self._metrics.registry.record_reconnect(self._metrics.serial_number, downtime)
+        logger.warning("Reconnected to %s in %.3f s", self._last_connected_serial_number, downtime)
+        if reader is not None:
+            self._apply_reader_settings()
+            self._reader = reader
+            reader.start(self._run_background_reader)
+        return downtime
+
+    def connection_stats(self):
+        """Returns the number of reconnects and the total downtime they took, in seconds."""
+        return {"connected": self._ft_handle is not None, "reconnects": self._reconnects, "downtime": self._downtime}
+
+    def __enter__(self):
+        self.open_usb_connection()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close_usb_connection()
+
+    def start_capture(self, filename: str):
+        """
+        Records every FT_Write, FT_Read and FT_GetQueueStatus call of this instance, with timestamps,
+        to a binary trace file that ReplayD2xx can play back.
+        """
+        logger.info("Start capture: %s", filename)
+        if self._capture is not None:
+            raise RuntimeError("A capture is already running")
+        self._capture = _CapturingLibrary(self._d2xx, filename, self._last_connected_serial_number)
+        self._d2xx = self._capture
+
+    def stop_capture(self):
+        logger.info("Stop capture.")
+        if self._capture is not None:
+            self._unwrap_library(self._capture)
+            self._capture.close()
+            self._capture = None
+
+    def enable_metrics(self, registry: MetricsRegistry | None = None):
+        """
+        Records the latency and status of every D2XX call of this instance, bytes in and out, the
+        commands sent per mnemonic, query latency and reconnects into registry (the shared module
+        registry 'metrics' by default). Returns the registry.
+        """
+        logger.info("Enable metrics.")
+        if self._metrics is None:
+            self._metrics = _InstrumentedLibrary(self._d2xx, registry or metrics, self._last_connected_serial_number)
+            self._d2xx = self._metrics
+        return self._metrics.registry
+
+    def disable_metrics(self):
+        logger.info("Disable metrics.")
+        if self._metrics is not None:
+            self._unwrap_library(self._metrics)
+            self._metrics = None
+
+    def _unwrap_library(self, layer):
+        # Capture and metrics wrap the library in either order; remove layer wherever it sits.
+        if self._d2xx is layer:
+            self._d2xx = layer.library
+            return
+        outer = self._d2xx
+        while outer.library is not layer:
+            outer = outer.library
+        outer.library = layer.library
+
+    def start_background_reader(self, late_size: int = 256):
+        """
+        Starts a thread that keeps draining the device FIFO into terminator-split frames, so query()
+        only waits for the next frame. Frames nobody waited for are kept in late_frames().
+        Methods that read the device directly (read(), scan downloads) pause the thread meanwhile.
+        """
+        logger.info("Start background reader.")
+        if self._reader is not None:
+            raise RuntimeError("A background reader is already running")
+        self._ensure_open()
+        self._apply_reader_settings()
+        self._reader = BackgroundReader(late_size)
+        self._reader.start(self._run_background_reader)
+
+    def _apply_reader_settings(self):
+        # The terminator flushes the chip as in event mode, and a short read timeout keeps the
+        # thread responsive to pause() and stop.
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_SetChars(
+                self._ft_handle, ctypes.c_ubyte(ord(self.terminator)), ctypes.c_ubyte(1), ctypes.c_ubyte(0), ctypes.c_ubyte(0)
+            )
+        )
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_SetTimeouts(
+                self._ft_handle, ctypes.c_uint32(self.event_read_timeout_ms), ctypes.c_uint32(self._link_profile.write_timeout)
+            )
+        )
+
+    def stop_background_reader(self):
+        logger.info("Stop background reader.")
+        reader, self._reader = self._reader, None
+        if reader is not None:
+            reader.stop()
+            if self._ft_handle is not None:
+                try:
+                    self._apply_read_mode()
+                except IOError as e:
+                    # A lost handle is configured again when it is reopened.
+                    logger.warning("Failed to restore the read mode settings: %s", e)
+
+    def late_frames(self):
+        """Returns the (timestamp, bytes) frames the background reader received while no query waited."""
+        return list(self._reader.late_frames) if self._reader is not None else []
+
+    def _reader_active(self):
+        return self._reader is not None and self._reader.running and not self._reader.paused
+
+    @contextmanager
+    def _reader_paused(self):
+        reader = self._reader
+        if reader is None:
+            yield
+            return
+        reader.pause()
+        try:
+            yield
+        finally:
+            reader.resume()
+
+    def _run_background_reader(self, reader: BackgroundReader):
+        buffer = bytearray(65536)
+        address = ctypes.addressof((ctypes.c_ubyte * len(buffer)).from_buffer(buffer))
+        available = ctypes.c_uint32()
+        bytes_read = ctypes.c_uint32()
+        terminator = self.terminator.encode("ascii")
+        try:
+            while reader.wait_while_paused():
+                handle = self._ft_handle
+                if handle is None:
+                    break
+                Ftd2xxhelper.__check(self._d2xx.FT_GetQueueStatus(handle, ctypes.byref(available)))
+                # With nothing queued, FT_Read blocks for a single byte up to the short read timeout.
+                count = min(max(available.value, 1), len(buffer))
+                Ftd2xxhelper.__check(
+                    self._d2xx.FT_Read(handle, ctypes.c_void_p(address), count, ctypes.byref(bytes_read))
+                )
+                if bytes_read.value > 0:
+                    data = memoryview(buffer)[:bytes_read.value]
+                    if self._frame_ring is not None:
+                        self._frame_ring.record("RX", data)
+                    reader.feed(data, terminator)
+        except (RuntimeError, IOError) as e:
+            logger.error("Background reader stopped: %s", e)
+            reader.error = e
 
     def close_usb_connection(self):
-        # logging.info(f"Closing USB connection, FT Handle: {self._ft_handle}")
+        # logger.info(f"Closing USB connection, FT Handle: {self._ft_handle}")
+        self.stop_background_reader()
         if self._ft_handle is not None:
             self._d2xx.FT_Close(self._ft_handle)
             self._ft_handle = None
 
     def disconnect(self):
-        logging.info("Disconnect device.")
+        logger.info("Disconnect device.")
         self.close_usb_connection()
 
+    @_reconnecting
     def write(self, command: str):
-        logging.info(f"Write operation, command: {command}")
+        self._write(command)
+
+    def _write(self, command: str):
+        self._send(command)
+        time.sleep(self._timing.write_delay(command) if self._timing is not None else 0.020)
+
+    def enable_adaptive_timing(self, timing: AdaptiveTiming | None = None):
+        """
+        Replaces the fixed 20 ms write pause and the query wait time with values learned per
+        command mnemonic. Returns the AdaptiveTiming, which can be shared between instances.
+        """
+        self._timing = timing if timing is not None else AdaptiveTiming()
+        return self._timing
+
+    def disable_adaptive_timing(self):
+        self._timing = None
+
+    def reset_adaptive_timing(self, command: str | None = None):
+        """Forgets the learned timing of the command, or of every command."""
+        if self._timing is not None:
+            self._timing.reset(command)
+
+    def _send(self, command: str):
+        logger.info("Write operation, command: %r", command)
+        if self._query_cache is not None:
+            self._query_cache.invalidate(command)
+        if self._metrics is not None:
+            self._metrics.registry.record_command(self._metrics.serial_number, command)
+        self._send_bytes(self._normalize_command(command).encode("ascii"))
+
+    def enable_query_cache(self, cacheable=("*IDN?",), max_entries: int = 128, invalidates=None):
+        """
+        Serves repeated queries of the cacheable commands from memory until a write changes the
+        related setting. invalidates maps a write header to extra queries it drops, e.g.
+        {'SWE': ['WAV?']}. Returns the QueryCache, whose hits and misses count lookups.
+        """
+        self._query_cache = QueryCache(cacheable, max_entries, invalidates)
+        return self._query_cache
+
+    def disable_query_cache(self):
+        self._query_cache = None
+
+    def _normalize_command(self, command: str):
+        """Cuts the command at its first terminator, or appends the terminator if it has none."""
         try:
             idx = command.index(self.terminator)
-            logging.info(f"Idx: {idx}")
+            logger.info("Idx: %s", idx)
             if idx == 0:
-                logging.error("Value error, The first character of the write command cannot be the command terminator")
+                logger.error("Value error, The first character of the write command cannot be the command terminator")
                 raise ValueError("The first character of the write command cannot be the command terminator")
             elif not command.endswith(self.terminator):
                 command = command[:idx]
-                logging.info(f"command: {command}")
+                logger.info("command: %r", command)
         except ValueError as e:
-            logging.error(f"Value error, {e}")
+            logger.info("Value error, %s", e)
             command = command + self.terminator
-            logging.info(f"command: {command}")
-            # logging.info(f"FT handle: {self._ft_handle}")
+            logger.info("command: %r", command)
+            # logger.info(f"FT handle: {self._ft_handle}")
+        return command
 
-        if self._ft_handle is None:
-            self._ft_handle = ctypes.c_void_p()
-            Ftd2xxhelper.__check(
-                self._d2xx.FT_OpenEx(
-                    self._last_connected_serial_number, 1, ctypes.byref(self._ft_handle)
-                )
-            )
+    def _send_bytes(self, data: bytes):
+        self._ensure_open()
 
-        written = ctypes.c_uint()
-        commandLen = len(command)
-        cmd = (ctypes.c_ubyte * commandLen).from_buffer_copy(command.encode("ascii"))
-        logging.info(f"cmd: {cmd}")
+        written = ctypes.c_uint32()
+        logger.debug("cmd: %r", data)
         Ftd2xxhelper.__check(
-            self._d2xx.FT_Write(self._ft_handle, cmd, commandLen, ctypes.byref(written))
+            self._d2xx.FT_Write(self._ft_handle, data, len(data), ctypes.byref(written))
         )
-        time.sleep(0.020)
+        if self._frame_ring is not None:
+            self._frame_ring.record("TX", data)
+
+    def _send_batch(self, commands, separator: str | None = None):
+        """Packs the commands into as few FT_Write calls as possible, split at command boundaries."""
+        normalized = []
+        for command in commands:
+            if self._query_cache is not None:
+                self._query_cache.invalidate(command)
+            if self._metrics is not None:
+                self._metrics.registry.record_command(self._metrics.serial_number, command)
+            command = self._normalize_command(command)
+            normalized.append(command if command.endswith(self.terminator) else command + self.terminator)
+        if separator is not None:
+            # Compound command: one line, commands joined by the separator (e.g. SCPI ';').
+            normalized = [separator.join(command[:-len(self.terminator)] for command in normalized) + self.terminator]
+        block = bytearray()
+        for command in normalized:
+            data = command.encode("ascii")
+            if block and len(block) + len(data) > self.max_batch_size:
+                self._send_bytes(bytes(block))
+                block.clear()
+            block += data
+        if block:
+            self._send_bytes(bytes(block))
+
+    @_reconnecting
+    def write_batch(self, commands, separator: str | None = None):
+        """
+        Writes several commands back-to-back with as few FT_Write calls as possible, pausing once
+        at the end instead of after every command. With a separator (e.g. ';'), the commands are
+        sent as a single compound command. With adaptive timing, the pause is the sum of the
+        learned pauses of the commands.
+        """
+        logger.info("Write batch operation, commands: %r", commands)
+        commands = list(commands)
+        self._send_batch(commands, separator)
+        if self._timing is not None:
+            time.sleep(sum(self._timing.write_delay(command) for command in commands))
+        else:
+            time.sleep(0.020)
+
+    @_reconnecting
+    def query_batch(self, commands, waitTime: int = 1, separator: str | None = None):
+        """
+        Sends several queries in one go and returns their responses, in the same order.
+        Without a separator every query is expected to answer with its own terminated line; with a
+        separator (e.g. ';'), the queries are sent as one compound command whose single response
+        line is split on the separator.
+        """
+        logger.info("Query batch operation, commands: %r, wait time: %s", commands, waitTime)
+        commands = list(commands)
+        if not commands:
+            return []
+        if self._reader_active():
+            self._reader.discard_late()
+        self._send_batch(commands, separator)
+        expected = len(commands) if separator is None else 1
+        arr = self.read_until_terminator(waitTime, expected)
 
-    def read(self, maxTimeToWait: float = 0.020, totalNumberOfBytesToRead: int = 0):
-        logging.info(f"Read operation, maxTimeToWait: {maxTimeToWait}, totalNumberOfBytesToRead: {totalNumberOfBytesToRead}")
-        if self._ft_handle is None:
-            self._ft_handle = ctypes.c_void_p()
-            Ftd2xxhelper.__check(
-                self._d2xx.FT_OpenEx(
-                    self._last_connected_serial_number, 1, ctypes.byref(self._ft_handle)
-                )
+        try:
+            response_str = arr.decode("ascii")
+        except UnicodeDecodeError:
+            logger.error("UnicodeDecodeError, %r", arr)
+            raise RuntimeError(f"Failed to decode the batch response: {arr}")
+        lines = response_str.split(self.terminator)[:expected]
+        if separator is not None and lines:
+            lines = lines[0].split(separator)
+        responses = [line.strip() for line in lines]
+        if len(responses) != len(commands):
+            logger.error("Batch response count mismatch, expect: %d, got: %d", len(commands), len(responses))
+            raise RuntimeError(
+                f"Invalid batch response, expect: {len(commands)} responses, got: {len(responses)}, {response_str!r}"
             )
+        return responses
+
+    def read(self, maxTimeToWait: float = 0.020, totalNumberOfBytesToRead: int = 0):
+        logger.info("Read operation, maxTimeToWait: %s, totalNumberOfBytesToRead: %s", maxTimeToWait, totalNumberOfBytesToRead)
+        length = self._read_loop(None, maxTimeToWait, totalNumberOfBytesToRead)
+        return self._rx_buffer[:length]
+
+    def read_view(self, maxTimeToWait: float = 0.020, totalNumberOfBytesToRead: int = 0):
+        """
+        Same as read(), but returns a memoryview of the internal receive buffer instead of a copy.
+        The view is only valid until the next read on this instance.
+        """
+        logger.info("Read view operation, maxTimeToWait: %s, totalNumberOfBytesToRead: %s", maxTimeToWait, totalNumberOfBytesToRead)
+        length = self._read_loop(None, maxTimeToWait, totalNumberOfBytesToRead)
+        return memoryview(self._rx_buffer)[:length]
+
+    def read_into(self, buffer, maxTimeToWait: float = 0.020, totalNumberOfBytesToRead: int = 0):
+        """
+        Same as read(), but FT_Read writes straight into the writable buffer (bytearray, array, mmap, ...).
+        Reading stops when the buffer is full. Returns the number of bytes written.
+        """
+        logger.info("Read into operation, maxTimeToWait: %s, totalNumberOfBytesToRead: %s", maxTimeToWait, totalNumberOfBytesToRead)
+        return self._read_loop(memoryview(buffer).cast("B"), maxTimeToWait, totalNumberOfBytesToRead)
+
+    @_pauses_reader
+    def _read_loop(self, view, maxTimeToWait: float, totalNumberOfBytesToRead: int):
+        # Reads into view, or into the growable internal receive buffer when view is None.
+        self._ensure_open()
+
+        if view is not None:
+            target = (ctypes.c_ubyte * view.nbytes).from_buffer(view)
+            address = ctypes.addressof(target)
+        else:
+            self._reserve_rx_buffer(0)
 
         timeCounter = 0.0
         sleepTimer = 0.020
 
-        binaryData = bytearray()
+        length = 0
         read = False
 
         try:
             while timeCounter < maxTimeToWait:
-                bytesRead = ctypes.c_uint()
-                available = ctypes.c_uint()
                 timeCounter += sleepTimer
                 time.sleep(sleepTimer)
                 Ftd2xxhelper.__check(
-                    self._d2xx.FT_GetQueueStatus(self._ft_handle, ctypes.byref(available))
+                    self._d2xx.FT_GetQueueStatus(self._ft_handle, ctypes.byref(self._available))
                 )
-                if available.value > 0:
+                available = self._available.value
+                if available > 0:
                     read = True
-                elif available.value == 0:
+                elif available == 0:
                     if read:
                         break
                     else:
                         continue
-                arr = (ctypes.c_ubyte * available.value)()
+                if view is None:
+                    self._reserve_rx_buffer(length + available, length)
+                    address = self._rx_address
+                else:
+                    available = min(available, view.nbytes - length)
+                    if available == 0:
+                        break
                 Ftd2xxhelper.__check(
                     self._d2xx.FT_Read(
-                        self._ft_handle, arr, available, ctypes.byref(bytesRead)
+                        self._ft_handle, ctypes.c_void_p(address + length), available, ctypes.byref(self._bytes_read)
                     )
                 )
-                buf = bytearray(arr)
-                binaryData.extend(buf)
+                if self._frame_ring is not None:
+                    frame = self._rx_buffer if view is None else view
+                    self._frame_ring.record("RX", frame[length: length + self._bytes_read.value])
+                length += self._bytes_read.value
 
-                if bytesRead.value > 0:
+                if self._bytes_read.value > 0:
                     timeCounter = 0
 
                 if (
-                        0 < totalNumberOfBytesToRead <= len(binaryData)
+                        0 < totalNumberOfBytesToRead <= length
                 ):
                     break
         except RuntimeError as e:
-            logging.error(f"Run time error: {e}")
+            logger.error("Run time error: %s", e)
             raise RuntimeError(e)
-
-        # self.close_usb_connection()
-        # logging.info(f"Binary data: {binaryData}")
-        return binaryData
+        finally:
+            # Releases the export of view, which a traceback through this frame would keep alive.
+            target = None
+
+        return length
+
+    def _reserve_rx_buffer(self, size: int, keep: int = 0):
+        """Grows the internal receive buffer to hold size bytes, preserving the first keep bytes."""
+        if self._rx_buffer is not None and len(self._rx_buffer) >= size:
+            return
+        capacity = max(size, 4096, 2 * len(self._rx_buffer) if self._rx_buffer is not None else 0)
+        # A new buffer is allocated rather than resized in place, so views handed out by read_view()
+        # stay valid and the exported ctypes array never blocks the resize.
+        buffer = bytearray(capacity)
+        if keep > 0:
+            buffer[:keep] = memoryview(self._rx_buffer)[:keep]
+        self._rx_buffer = buffer
+        self._rx_address = ctypes.addressof((ctypes.c_ubyte * capacity).from_buffer(buffer))
+
+    def read_until_terminator(self, maxTimeToWait: float = 1.0, count: int = 1):
+        """Reads until count command terminators are received or maxTimeToWait elapses."""
+        logger.info("Read until terminator operation, maxTimeToWait: %s, count: %d", maxTimeToWait, count)
+        self._ensure_open()
+
+        if self._reader_active():
+            return self._read_frames(maxTimeToWait, count)
+
+        terminator = self.terminator.encode("ascii")
+        deadline = time.monotonic() + maxTimeToWait
+        length = 0
+        found = 0
+
+        while True:
+            received = self._read_available(length)
+            if received > 0:
+                start = length
+                length += received
+                found += self._rx_buffer.count(terminator, start, length)
+                if found >= count:
+                    break
+            if time.monotonic() >= deadline:
+                logger.info("Terminator not received within %s s, read %d bytes", maxTimeToWait, length)
+                break
+
+        return self._rx_buffer[:length]
+
+    def read_frame(self, maxTimeToWait: float = 1.0, idleTimeout: float = 1.0):
+        """
+        Reads one response frame, a terminated line or an IEEE 488.2 definite-length block, and
+        returns a memoryview of its payload without the terminator or block header, as soon as the
+        frame is complete. Returns None when no complete frame arrives within maxTimeToWait, or
+        within idleTimeout of the last received byte. The view is valid until the next read.
+        """
+        logger.info("Read frame operation, maxTimeToWait: %s, idleTimeout: %s", maxTimeToWait, idleTimeout)
+        if self._read_frame(maxTimeToWait, idleTimeout) < 0:
+            return None
+        start, end = self._parser.payload
+        return memoryview(self._rx_buffer)[start:end]
+
+    @_pauses_reader
+    def query_frame(self, command: str, waitTime: float = 1.0):
+        """Sends command and returns the payload of its response frame, as read_frame(), without decoding it."""
+        # The reader is paused before the send, else it can take the response first.
+        logger.info("Query frame operation, command: %r, wait time: %s", command, waitTime)
+        self._send(command)
+        return self.read_frame(waitTime, waitTime)
+
+    @_pauses_reader
+    def _read_frame(self, maxTimeToWait: float, idleTimeout: float, indefinite_length: int | None = None):
+        """
+        Reads into the internal receive buffer until self._parser completes a frame; returns its end or -1.
+        indefinite_length is the payload size of a '#0' block, see ResponseParser.reset().
+        """
+        self._ensure_open()
+        if self._parser is None:
+            self._parser = ResponseParser((self.terminator + "\n").encode("ascii"))
+        parser = self._parser
+        parser.reset(indefinite_length)
+        # Bytes received after the previous frame come first.
+        length = len(self._rx_surplus)
+        self._reserve_rx_buffer(length)
+        self._rx_buffer[:length] = self._rx_surplus
+        self._rx_surplus = b""
+        end = parser.feed(self._rx_buffer, length) if length else -1
+        deadline = time.monotonic() + maxTimeToWait
+        while end < 0:
+            received = self._read_available(length, parser.needed(length))
+            now = time.monotonic()
+            if received > 0:
+                length += received
+                end = parser.feed(self._rx_buffer, length)
+                deadline = max(deadline, now + idleTimeout)
+            elif now >= deadline:
+                # The incomplete frame is dropped, so it cannot prefix the next response.
+                logger.info("No complete frame within %s s, dropped %d bytes", maxTimeToWait, length)
+                return -1
+        if length > end:
+            self._rx_surplus = bytes(self._rx_buffer[end:length])
+        return end
+
+    def _receive_frame(self, maxTimeToWait: float):
+        end = self._read_frame(maxTimeToWait, maxTimeToWait)
+        return self._rx_buffer[self._parser.frame_start:end] if end >= 0 else b""
+
+    def _read_frames(self, maxTimeToWait: float, count: int):
+        """Joins up to count frames of the background reader received within maxTimeToWait."""
+        deadline = time.monotonic() + maxTimeToWait
+        received = bytearray()
+        for _ in range(count):
+            frame = self._reader.next_frame(max(0.0, deadline - time.monotonic()))
+            if frame is None:
+                logger.info("Terminator not received within %s s, read %d bytes", maxTimeToWait, len(received))
+                break
+            received += frame
+        return received
+
+    def _read_available(self, offset: int = 0, maxBytes: int = 0):
+        """
+        Reads the queued bytes (up to maxBytes) into the internal receive buffer at offset,
+        blocking in FT_Read for the first byte when none are queued. Returns the number of bytes read.
+        """
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_GetQueueStatus(self._ft_handle, ctypes.byref(self._available))
+        )
+        # With nothing queued, ask for a single byte: FT_Read blocks until it arrives
+        # or the read timeout expires, so no time is spent sleeping on an idle loop.
+        count = self._available.value if self._available.value > 0 else 1
+        if maxBytes > 0:
+            count = min(count, maxBytes)
+        self._reserve_rx_buffer(offset + count, offset)
+        Ftd2xxhelper.__check(
+            self._d2xx.FT_Read(
+                self._ft_handle, ctypes.c_void_p(self._rx_address + offset), count, ctypes.byref(self._bytes_read)
+            )
+        )
+        if self._frame_ring is not None and self._bytes_read.value > 0:
+            self._frame_ring.record("RX", self._rx_buffer[offset: offset + self._bytes_read.value])
+        return self._bytes_read.value
+
+    def purge_receive_buffer(self):
+        """Discards any bytes waiting in the device receive buffer."""
+        logger.info("Purge receive buffer.")
+        self._rx_surplus = b""
+        if self._ft_handle is not None:
+            Ftd2xxhelper.__check(self._d2xx.FT_Purge(self._ft_handle, ctypes.c_uint32(1)))
 
     def query_idn(self):
-        logging.info("Query Idn")
+        logger.info("Query Idn")
         return self.query("*IDN?")
 
+    @_reconnecting
     def query(self, command: str, waitTime: int = 1):
-        logging.info(f"Query operation, command: {command}, wait time: {waitTime}")
-        if self._ft_handle is None:
-            self._ft_handle = ctypes.c_void_p()
-            Ftd2xxhelper.__check(
-                self._d2xx.FT_OpenEx(
-                    self._last_connected_serial_number, 1, ctypes.byref(self._ft_handle)
-                )
-            )
-
-        self.write(command)
-
-        arr = self.read(waitTime)
+        logger.info("Query operation, command: %r, wait time: %s", command, waitTime)
+        if self._query_cache is not None and self._query_cache.is_cacheable(command):
+            response = self._query_cache.get(command)
+            if response is None:
+                response = self._query(command, waitTime)
+                if response:
+                    self._query_cache.put(command, response)
+            return response
+        return self._query(command, waitTime)
+
+    def _query(self, command: str, waitTime: int = 1):
+        self._ensure_open()
+
+        deadline = self._timing.read_deadline(command, waitTime) if self._timing is not None else waitTime
+        start = sent = time.monotonic()
+        if self._reader_active():
+            self._reader.discard_late()
+            self._send(command)
+            receive = lambda timeout: self._reader.next_frame(timeout) or b""
+        elif self._read_mode == "event":
+            self._send(command)
+            receive = self._receive_frame
+        else:
+            self._write(command)
+            # The pause after the write is not part of the response latency, else it feeds back into itself.
+            sent = time.monotonic()
+            receive = self.read
+        arr = receive(deadline)
+        if len(arr) == 0 and deadline < waitTime:
+            # The learned deadline only shortens the wait for replies that come in time; a slower reply
+            # is still collected within waitTime, so it cannot become the response of the next query.
+            logger.info("No response to %s within the learned %s s, waiting up to %s s", command, deadline, waitTime)
+            arr = receive(waitTime - deadline)
+        if self._timing is not None:
+            self._timing.record(command, time.monotonic() - sent)
+        if self._metrics is not None:
+            self._metrics.registry.record_query(self._metrics.serial_number, command, time.monotonic() - start)
 
         response_str = ""
         try:
             response_str = arr.decode("ascii")
-            logging.info(f"Response str: {response_str}")
+            logger.info("Response str: %r", response_str)
         except UnicodeDecodeError:
-            logging.error(f"UnicodeDecodeError, {response_str}, {arr}")
+            logger.error("UnicodeDecodeError, %r, %r", response_str, arr)
             print(arr)
             return response_str
 
@@ -447,16 +2584,16 @@ class Ftd2xxhelper(object):
             return response_str
 
         trimmed = self.__remove_prefix_from_result_if_not_hex(response_str.strip())
-        logging.info(f"Trimmed response str: {trimmed}")
+        logger.info("Trimmed response str: %r", trimmed)
 
         try:
             idx = trimmed.rindex(self.terminator)
-            logging.info(f"Idx: {idx}")
+            logger.info("Idx: %s", idx)
             if len(trimmed) - 2 > idx:
                 trimmed = trimmed[(idx + 1):].strip()
-                logging.info(f"Trimmed: {trimmed}")
+                logger.info("Trimmed: %r", trimmed)
         except ValueError as e:
-            logging.error(f"Value error, {e}")
+            logger.info("Value error, %s", e)
             pass
 
         if trimmed == response_str.strip():
@@ -466,7 +2603,7 @@ class Ftd2xxhelper(object):
 
     @staticmethod
     def __remove_prefix_from_result_if_not_hex(result_str: str):
-        logging.info(f"Remove prefix from result if not hex, result str: {result_str}, len: {len(result_str)}")
+        logger.info("Remove prefix from result if not hex, result str: %r", result_str)
         if result_str is None or len(result_str) < 3:
             return result_str
 
@@ -479,11 +2616,30 @@ class Ftd2xxhelper(object):
         if result_str[0] not in string.hexdigits or result_str[1] not in string.hexdigits:
             return result_str[2:]
 
-        logging.info(f"Result str: {result_str}, len: {len(result_str)}")
+        logger.info("Result str: %r, len: %d", result_str, len(result_str))
         return result_str
 
-    def get_all_data_points_from_last_scan_scpi_command(self):
-        logging.info("Get all data points from last scan using SCPI command.")
+    @staticmethod
+    def _import_numpy():
+        """Imports numpy on demand; it is only needed for array results."""
+        try:
+            import numpy
+        except ImportError as e:
+            logger.error(f"Failed to import numpy: {e}")
+            raise RuntimeError(f"numpy is required for array results: {e}")
+        return numpy
+
+    @_pauses_reader
+    def get_all_data_points_from_last_scan_scpi_command(self, as_numpy: bool = False, native_byte_order: bool = False,
+                                                        archive: ScanArchive | None = None):
+        """
+        Downloads the data points of the last scan with the SCPI READout commands.
+        By default, returns a list of 1-tuples of floats. With as_numpy, returns a numpy float32
+        array copied out of the receive buffer (big-endian, or byteswapped in place to native order
+        with native_byte_order). With archive, the data is read straight into a new scan of the
+        ScanArchive and its index is returned. Raises RuntimeError when the data block is incomplete.
+        """
+        logger.info(f"Get all data points from last scan using SCPI command, as_numpy: {as_numpy}")
         getCountCommand = "READout:POINts?"
         getDataCommand = "READout:DATa?"
 
@@ -502,59 +2658,83 @@ class Ftd2xxhelper(object):
                 f"The number of data points received from the last scan is too large: {points}"
             )
 
-        self.write(getDataCommand)
-        time.sleep(5)
-        arr = self.read(1, points * 4)
-        if len(arr) == 0:
-            return arr
+        if archive is not None:
+            return self._download_scan_to_archive(archive, getDataCommand, points, ">f4", block=True)
 
-        if arr[0] != ord("#"):
-            print(arr[0])
-            raise ValueError(
-                f"The value read was supposed to contain a # symbol as the first byte, but contained '{arr[0]}'"
-            )
-
-        b = chr(arr[1])
-        try:
-            val = int(b)
-        except Exception as e:
-            print(arr[1], b)
-            raise ValueError(
-                f"The value read was supposed to contain a number as the second byte, but contained '{b}', {e}"
-            )
-
-        b = "".join(map(chr, arr[2: 2 + val]))
-        try:
-            num = int(b)
-        except Exception as e:
-            print(arr[2: 2 + val], b)
-            raise ValueError(
-                f"The value read was supposed to contain a number, but contained '{b}', {e}"
+        # The read completes as soon as the whole definite-length block has arrived.
+        self._send(getDataCommand)
+        # A '#0' block is binary data that may contain CR or LF, so its end follows from the point count.
+        end = self._read_frame(5, 1, points * 4)
+        if end < 0:
+            offset, stop = self._parser.payload
+            expected = stop - offset if stop is not None else points * 4
+            raise RuntimeError(
+                f"Scan data transfer incomplete, received {self._parser.received} of {expected} bytes"
             )
-
-        offset = 2 + val
-        return list(
-            map(
-                lambda x: struct.unpack(">f", x),
-                Ftd2xxhelper.__chunks(arr[offset:], num, 4),
+        start = self._parser.frame_start
+        ResponseParser.block_header(self._rx_buffer, start, end)
+        offset, stop = self._parser.payload
+        if (stop - offset) // 4 < points:
+            raise RuntimeError(
+                f"The scan data block is too short, received {stop - offset} of {points * 4} bytes"
             )
-        )
-
-    def get_all_data_points_from_last_scan_santec_command(self):
-        logging.info("Get all data points from last scan using Santec command.")
+        count = points
+        if as_numpy:
+            numpy = Ftd2xxhelper._import_numpy()
+            # Copied out of the receive buffer, which the next read overwrites.
+            values = numpy.frombuffer(self._rx_buffer[offset: offset + count * 4], dtype=">f4", count=count)
+            if native_byte_order and sys.byteorder == "little":
+                values.byteswap(inplace=True)
+                values = values.view(values.dtype.newbyteorder())
+            return values
+
+        return list(struct.iter_unpack(">f", memoryview(self._rx_buffer)[offset: offset + count * 4]))
+
+    @_pauses_reader
+    def get_all_data_points_from_last_scan_santec_command(self, as_numpy: bool = False, compact: bool = False, out=None,
+                                                          archive: ScanArchive | None = None):
+        """
+        Downloads the data points of the last scan with the Santec TN / TA commands.
+        By default, returns a list of ints. With compact, returns an array.array of unsigned
+        32-bit words; with as_numpy, a big-endian uint32 numpy view of the receive buffer.
+        out may be a preallocated array.array or numpy uint32 array that is filled in place
+        (an array.array is resized to the point count) and returned, so repeated scans reuse it.
+        With archive, the data is read straight into a new scan of the ScanArchive and its index is returned.
+        """
+        logger.info(f"Get all data points from last scan using Santec command, "
+                     f"as_numpy: {as_numpy}, compact: {compact}, out: {type(out).__name__}")
         getCountCommand = "TN"
         getDataCommand = "TA"
 
         points = int(self.query(getCountCommand))
 
+        if archive is not None:
+            return self._download_scan_to_archive(archive, getDataCommand, points, ">u4")
+
         self.write(getDataCommand)
-        arr = self.read(1, points * 4)
+        # Only the numpy result aliases the received bytes; every other result copies them out,
+        # so those can decode straight from the internal receive buffer.
+        arr = self.read(1, points * 4) if as_numpy else self.read_view(1, points * 4)
 
         if len(arr) != points * 4:
             raise ValueError(
                 f"Invalid data with mismatch length returned, expect: {points}, got: {len(arr)}"
             )
 
+        if out is not None:
+            return Ftd2xxhelper._decode_uint32_into(arr, points, out)
+
+        if as_numpy:
+            numpy = Ftd2xxhelper._import_numpy()
+            return numpy.frombuffer(arr, dtype=">u4", count=points)
+
+        if compact:
+            values = array.array(UINT32_TYPECODE)
+            values.frombytes(arr)
+            if sys.byteorder == "little":
+                values.byteswap()
+            return values
+
         if sys.version_info[1] >= 12:
             import itertools
 
@@ -569,8 +2749,607 @@ class Ftd2xxhelper(object):
             )
         )
 
+    def _read_block_header(self, maxTimeToWait: float = 5.0):
+        """
+        Reads an IEEE 488.2 definite-length block header ('#', digit count, length) and returns
+        the announced byte length, or None for an indefinite-length ('#0') block.
+        """
+        header = bytearray(2)
+        received = self.read_into(header, maxTimeToWait, 2)
+        # The terminator that follows the previous block (of a ranged segment, say) is still queued.
+        while received == 2 and header[0] in b"\r\n":
+            header[0] = header[1]
+            received = 1 + self.read_into(memoryview(header)[1:], maxTimeToWait, 1)
+        if received < 2 or header[0] != ord("#") or not chr(header[1]).isdigit():
+            raise ValueError(f"The value read was supposed to start with a block header, but contained {bytes(header)!r}")
+        digits = bytearray(int(chr(header[1])))
+        if digits and (self.read_into(digits, 1, len(digits)) < len(digits) or not digits.isdigit()):
+            raise ValueError(f"The value read was supposed to contain a number, but contained {bytes(digits)!r}")
+        return int(digits) if digits else None
+
+    def _download_scan_to_archive(self, archive: ScanArchive, command: str, points: int, dtype: str, block: bool = False):
+        """
+        Sends command and reads the scan data into a new scan of archive, without an intermediate
+        buffer. With block, the data is preceded by an IEEE 488.2 definite-length block header.
+        """
+        self.write(command)
+        if block:
+            length = self._read_block_header()
+            if length is not None:
+                points = min(points, length // 4)
+        serial_number = bytes(self._last_connected_serial_number or b"")
+        with archive.writer(points, dtype, serial_number) as view:
+            # The archive stays locked while writing, so the new scan is the next one in the index.
+            index = len(archive)
+            length = self.read_into(view, 1, points * 4)
+            if length != points * 4:
+                raise ValueError(
+                    f"Invalid data with mismatch length returned, expect: {points * 4}, got: {length}"
+                )
+        return index
+
+    @_pauses_reader
+    def download_scan_segmented(self, command: str = "scpi", segment_points: int = 65536, retries: int = 3,
+                                range_command: str | None = None, archive: ScanArchive | None = None,
+                                segment_timeout: float = 1.0, maxTimeToWait: float = 5.0, progress=None):
+        """
+        Downloads the data points of the last scan in segments of segment_points, without the
+        200001 point limit. command selects 'scpi' (READout, float32 values) or 'santec' (TN / TA,
+        unsigned 32-bit values). With range_command, a template such as 'READout:DATa? {start},{count}',
+        every segment is requested on its own; otherwise the whole scan is requested once and a failed
+        segment resumes at the received byte offset by requesting it again and skipping what arrived.
+        Every segment must arrive complete, and only the failed segment is retried, up to retries times.
+        Returns an array.array in native byte order, or the scan index with archive.
+        progress(received_points, total_points) is called after every segment.
+        """
+        logger.info("Download scan segmented, command: %s, segment points: %d, ranged: %s",
+                    command, segment_points, range_command is not None)
+        if command == "scpi":
+            getCountCommand, getDataCommand, typecode, dtype = "READout:POINts?", "READout:DATa?", "f", ">f4"
+        elif command == "santec":
+            getCountCommand, getDataCommand, typecode, dtype = "TN", "TA", UINT32_TYPECODE, ">u4"
+        else:
+            raise ValueError(f"Unknown scan command set '{command}', expected 'scpi' or 'santec'")
+        if segment_points <= 0:
+            raise ValueError(f"segment_points must be positive, got {segment_points}")
+
+        response_str = self.query(getCountCommand)
+        try:
+            points = int(response_str)
+        except ValueError:
+            raise RuntimeError(
+                f"Failed to retrieve a valid number of data points from the last scan: {response_str}"
+            )
+
+        if archive is not None:
+            with archive.writer(points, dtype, bytes(self._last_connected_serial_number or b"")) as view:
+                index = len(archive)
+                self._download_segments(view, points, getDataCommand, command == "scpi", segment_points,
+                                        retries, range_command, segment_timeout, maxTimeToWait, progress)
+            return index
+
+        values = array.array(typecode, bytes(points * 4))
+        self._download_segments(memoryview(values).cast("B"), points, getDataCommand, command == "scpi",
+                                segment_points, retries, range_command, segment_timeout, maxTimeToWait, progress)
+        if sys.byteorder == "little":
+            values.byteswap()
+        return values
+
+    def _download_segments(self, view, points: int, getDataCommand: str, block: bool, segment_points: int,
+                           retries: int, range_command: str | None, segment_timeout: float,
+                           maxTimeToWait: float, progress):
+        """Fills view with the big-endian scan data, segment by segment."""
+        total = points * 4
+        offset = 0
+        streaming = False
+        while offset < total:
+            size = min(segment_points * 4, total - offset)
+            for attempt in range(retries + 1):
+                try:
+                    if range_command is not None:
+                        self._send(range_command.format(start=offset // 4, count=size // 4))
+                        if block:
+                            self._read_block_header(maxTimeToWait)
+                    elif not streaming:
+                        self._send(getDataCommand)
+                        if block:
+                            self._read_block_header(maxTimeToWait)
+                        self._skip_received(offset, segment_timeout)
+                        streaming = True
+                    received = self._read_segment(view[offset: offset + size], segment_timeout)
+                    if received == size:
+                        break
+                    logger.warning("Scan segment at byte %d incomplete, %d of %d bytes (attempt %d of %d)",
+                                   offset, received, size, attempt + 1, retries + 1)
+                except (RuntimeError, ValueError, IOError) as e:
+                    logger.warning("Scan segment at byte %d failed: %s (attempt %d of %d)",
+                                   offset, e, attempt + 1, retries + 1)
+                    if (isinstance(e, IOError) and e.errno in Ftd2xxhelper.lost_connection_status
+                            and self._reconnect_policy is not None):
+                        self.reconnect()
+                self.purge_receive_buffer()
+                streaming = False
+            else:
+                raise RuntimeError(
+                    f"Scan data transfer failed at point {offset // 4} of {points} after {retries + 1} attempts"
+                )
+            offset += size
+            if progress is not None:
+                progress(offset // 4, points)
+        if streaming or block:
+            # Drop anything the instrument sends after the data, such as a block terminator.
+            self.purge_receive_buffer()
+
+    def _read_segment(self, view, segment_timeout: float):
+        """Reads into view until it is full or nothing arrives for segment_timeout. Returns the bytes read."""
+        received = 0
+        while received < view.nbytes:
+            length = self.read_into(view[received:], segment_timeout, view.nbytes - received)
+            if length == 0:
+                break
+            received += length
+        return received
+
+    def _skip_received(self, count: int, segment_timeout: float):
+        """Reads and discards the first count bytes of a repeated transfer."""
+        scratch = bytearray(min(count, 65536))
+        while count > 0:
+            length = self._read_segment(memoryview(scratch)[:min(count, len(scratch))], segment_timeout)
+            if length == 0:
+                raise RuntimeError(f"Scan data transfer stalled while resuming, {count} bytes left to skip")
+            count -= length
+
+    @_pauses_reader
+    def iter_scan_data(self, command: str = "scpi", chunk_points: int = 4096, progress=None,
+                       as_numpy: bool = False, maxTimeToWait: float = 10.0, idleTimeout: float = 1.0):
+        """
+        Streams the data points of the last scan, yielding decoded chunks of up to chunk_points
+        as soon as the bytes arrive. command selects 'scpi' (READout, float32 values) or
+        'santec' (TN / TA, unsigned 32-bit values). Chunks are tuples, or numpy arrays with as_numpy.
+        progress(received_points, total_points) is called after every chunk; returning False
+        cancels the transfer and purges the remaining bytes.
+        """
+        logger.info(f"Iterate scan data, command: {command}, chunk points: {chunk_points}")
+        if command == "scpi":
+            getCountCommand, getDataCommand, fmt, dtype = "READout:POINts?", "READout:DATa?", "f", ">f4"
+        elif command == "santec":
+            getCountCommand, getDataCommand, fmt, dtype = "TN", "TA", "I", ">u4"
+        else:
+            raise ValueError(f"Unknown scan command set '{command}', expected 'scpi' or 'santec'")
+        if chunk_points <= 0:
+            raise ValueError(f"chunk_points must be positive, got {chunk_points}")
+
+        response_str = self.query(getCountCommand)
+        try:
+            points = int(response_str)
+        except ValueError:
+            raise RuntimeError(
+                f"Failed to retrieve a valid number of data points from the last scan: {response_str}"
+            )
+
+        numpy = Ftd2xxhelper._import_numpy() if as_numpy else None
+        self._send(getDataCommand)
+
+        pending = bytearray()
+        received = 0
+        header_done = command != "scpi"
+        deadline = time.monotonic() + maxTimeToWait
+        try:
+            while received < points:
+                length = self._read_available()
+                now = time.monotonic()
+                if length == 0:
+                    if now >= deadline:
+                        raise RuntimeError(
+                            f"Scan data transfer timed out after {received} of {points} points"
+                        )
+                    continue
+                deadline = now + idleTimeout
+                pending += memoryview(self._rx_buffer)[:length]
+
+                if not header_done:
+                    header = ResponseParser.block_header(pending)
+                    if header is None:
+                        continue
+                    offset, size = header
+                    if size is not None:
+                        points = min(points, size // 4)
+                    del pending[:offset]
+                    header_done = True
+
+                while received < points:
+                    count = min(chunk_points, len(pending) // 4, points - received)
+                    if count == 0 or (count < chunk_points and received + count < points):
+                        break
+                    if numpy is not None:
+                        values = numpy.frombuffer(pending, dtype=dtype, count=count).copy()
+                    else:
+                        values = struct.unpack_from(f">{count}{fmt}", pending)
+                    del pending[:count * 4]
+                    received += count
+                    yield values
+                    if progress is not None and progress(received, points) is False:
+                        logger.info("Scan data transfer cancelled after %d of %d points", received, points)
+                        return
+        finally:
+            if received < points:
+                # Cancelled, closed early by the consumer or failed: the rest of the scan is drained,
+                # else it would prefix the next response.
+                self._discard_scan_rest((points - received) * 4 - len(pending) if header_done else 0, idleTimeout)
+
+    def _discard_scan_rest(self, count: int, idleTimeout: float):
+        """Reads and drops up to count bytes until nothing arrives for idleTimeout, then purges the receive buffer."""
+        quiet = time.monotonic() + idleTimeout
+        while count > 0 and time.monotonic() < quiet:
+            length = self._read_available(0, count)
+            if length > 0:
+                count -= length
+                quiet = time.monotonic() + idleTimeout
+        self.purge_receive_buffer()
+
+    @staticmethod
+    def _decode_uint32_into(data: bytearray, count: int, out):
+        """Copies count big-endian 32-bit words from data into out, converting to native order in bulk."""
+        if isinstance(out, array.array):
+            if out.typecode != UINT32_TYPECODE:
+                raise ValueError(
+                    f"The output array must hold unsigned 4-byte items ('{UINT32_TYPECODE}'), got typecode '{out.typecode}'"
+                )
+            if len(out) > count:
+                del out[count:]
+            elif len(out) < count:
+                out.frombytes(bytes((count - len(out)) * 4))
+            target = out
+        else:
+            target = out[:count]
+            view = memoryview(target)
+            if view.itemsize != 4 or view.format not in ("I", "L", "=I", "=L"):
+                raise ValueError(f"The output buffer must hold native unsigned 4-byte items, got '{view.format}'")
+            if len(target) < count:
+                raise ValueError(f"The output buffer is too small, expect: {count}, got: {len(target)}")
+
+        memoryview(target).cast("B")[:] = memoryview(data)[:count * 4]
+        if sys.byteorder == "little":
+            if isinstance(target, array.array):
+                target.byteswap()
+            else:
+                target.byteswap(inplace=True)
+        return target
+
     @staticmethod
     def __chunks(arr: bytearray, length: int, n: int = 4):
-        logging.info(f"Chunks, arr:{arr}, length: {length}, n: {n}")
+        logger.info("Chunks, arr len: %d, length: %d, n: %d", len(arr), length, n)
         for i in range(0, length):
             yield arr[i * n: i * n + n]
+
+
+class AsyncFtd2xxhelper(object):
+    """
+    asyncio interface to Ftd2xxhelper.
+    The blocking D2XX calls of each instrument run on a dedicated worker thread, so the event loop
+    never blocks and several instruments can be driven concurrently with asyncio.gather().
+    """
+
+    __slots__ = ["_helper", "_executor"]
+
+    def __init__(self, helper: Ftd2xxhelper, executor: ThreadPoolExecutor | None = None):
+        self._helper = helper
+        self._executor = executor if executor is not None else \
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="ftd2xx-async")
+
+    @classmethod
+    async def open(cls, serial_number: str | bytes | None = None, **kwargs):
+        """Creates and initializes the Ftd2xxhelper on the worker thread."""
+        logger.info("Async open, serial number: %s", serial_number)
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ftd2xx-async")
+        loop = asyncio.get_running_loop()
+        try:
+            helper = await loop.run_in_executor(
+                executor, functools.partial(Ftd2xxhelper, serial_number, **kwargs)
+            )
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return cls(helper, executor)
+
+    @property
+    def helper(self) -> Ftd2xxhelper:
+        return self._helper
+
+    async def _run(self, function, *args, **kwargs):
+        # One worker thread per instrument keeps the calls on a handle in order.
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def write(self, command: str):
+        return await self._run(self._helper.write, command)
+
+    async def read(self, maxTimeToWait: float = 0.020, totalNumberOfBytesToRead: int = 0):
+        return await self._run(self._helper.read, maxTimeToWait, totalNumberOfBytesToRead)
+
+    async def query(self, command: str, waitTime: int = 1):
+        return await self._run(self._helper.query, command, waitTime)
+
+    async def query_idn(self):
+        return await self._run(self._helper.query_idn)
+
+    async def get_all_data_points_from_last_scan_scpi_command(self, **kwargs):
+        return await self._run(self._helper.get_all_data_points_from_last_scan_scpi_command, **kwargs)
+
+    async def get_all_data_points_from_last_scan_santec_command(self, **kwargs):
+        return await self._run(self._helper.get_all_data_points_from_last_scan_santec_command, **kwargs)
+
+    async def iter_scan_data(self, *args, **kwargs):
+        """Async version of Ftd2xxhelper.iter_scan_data(); the progress callback runs on the worker thread."""
+        iterator = self._helper.iter_scan_data(*args, **kwargs)
+        done = object()
+        try:
+            while True:
+                chunk = await self._run(next, iterator, done)
+                if chunk is done:
+                    break
+                yield chunk
+        finally:
+            await self._run(iterator.close)
+
+    async def close(self):
+        """Closes the USB connection and stops the worker thread."""
+        try:
+            await self._run(self._helper.close_usb_connection)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class Ftd2xxPool(object):
+    """
+    Holds open Ftd2xxhelper instances for several instruments, keyed by serial number, and runs
+    the same command on all of them concurrently. A failing device does not stop the others:
+    its exception is stored in errors, keyed by serial number. The devices that failed to open stay
+    listed there, and every call replaces the entries of the devices it ran on.
+    """
+
+    __slots__ = ["_devices", "_executor", "errors"]
+
+    def __init__(self, serial_numbers=None, max_workers: int = 16, **kwargs):
+        logger.info("Ftd2xxPool initialized. Serial numbers: %s", serial_numbers)
+        self._devices = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ftd2xx-pool")
+        self.errors = {}
+        if serial_numbers is None:
+            serial_numbers = [device.SerialNumber for device in Ftd2xxhelper.list_devices()]
+        for serial_number in serial_numbers:
+            try:
+                self.add(serial_number, **kwargs)
+            except Exception as e:
+                logger.error("Failed to open device %s: %s", serial_number, e)
+                self.errors[Ftd2xxPool._key(serial_number)] = e
+
+    @staticmethod
+    def _key(serial_number: str | bytes):
+        return serial_number.decode("ascii") if isinstance(serial_number, bytes) else str(serial_number)
+
+    def add(self, serial_number: str | bytes, **kwargs):
+        """Opens the instrument with the given serial number and adds it to the pool."""
+        key = Ftd2xxPool._key(serial_number)
+        if key not in self._devices:
+            self._devices[key] = Ftd2xxhelper(key.encode("ascii"), **kwargs)
+        return self._devices[key]
+
+    def remove(self, serial_number: str | bytes):
+        """Closes the instrument and removes it from the pool."""
+        helper = self._devices.pop(Ftd2xxPool._key(serial_number), None)
+        if helper is not None:
+            helper.close_usb_connection()
+
+    @property
+    def serial_numbers(self):
+        return list(self._devices)
+
+    def __getitem__(self, serial_number: str | bytes) -> Ftd2xxhelper:
+        return self._devices[Ftd2xxPool._key(serial_number)]
+
+    def __contains__(self, serial_number: str | bytes):
+        return Ftd2xxPool._key(serial_number) in self._devices
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __iter__(self):
+        return iter(self._devices.items())
+
+    def map(self, function, serial_numbers=None):
+        """
+        Calls function(helper) for every instrument (or the given serial numbers) on the worker pool.
+        Returns {serial: result} for the devices that succeeded; the others are listed in errors.
+        """
+        keys = list(self._devices) if serial_numbers is None else [Ftd2xxPool._key(s) for s in serial_numbers]
+        for key in keys:
+            if key not in self._devices:
+                raise ValueError(f"Device '{key}' is not in the pool")
+        futures = {key: self._executor.submit(function, self._devices[key]) for key in keys}
+        results = {}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+                self.errors.pop(key, None)
+            except Exception as e:
+                logger.error("Device %s failed: %s", key, e)
+                self.errors[key] = e
+        return results
+
+    def broadcast_write(self, command: str, serial_numbers=None):
+        """Writes command to every instrument concurrently. Returns the errors dictionary."""
+        logger.info("Broadcast write, command: %r", command)
+        self.map(lambda helper: helper.write(command), serial_numbers)
+        return self.errors
+
+    def gather_query(self, command: str, waitTime: int = 1, serial_numbers=None):
+        """Queries every instrument concurrently. Returns {serial: response}."""
+        logger.info("Gather query, command: %r", command)
+        return self.map(lambda helper: helper.query(command, waitTime), serial_numbers)
+
+    def close(self):
+        """Closes every instrument and stops the worker threads."""
+        for key in list(self._devices):
+            try:
+                self.remove(key)
+            except Exception as e:
+                logger.error("Failed to close device %s: %s", key, e)
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SweepPipeline(object):
+    """
+    Runs repeated sweeps as a pipeline: while the results of sweep N are processed on a worker
+    thread, sweep N+1 is already armed, triggered and downloaded from every detector concurrently.
+    Download buffers rotate between depth slots (double buffering with the default depth of 2), so
+    at most depth sweeps are in flight and a slow process stage holds the acquisition back.
+
+    trigger(index) arms and starts sweep index on the laser and detectors, and returns once its
+    data can be downloaded. download(helper, buffer) reads one detector's data into its buffer of
+    the current slot and returns it; by default the Santec TA data is decoded into an array.array.
+    process(index, results) receives {serial: data}; the buffers are reused once it returns.
+    """
+
+    stages = ("backpressure", "trigger", "download", "process")
+
+    __slots__ = ["trigger", "process", "download", "depth", "_detectors", "_buffers", "_executor",
+                 "_timings", "_sweeps", "_seconds", "_lock"]
+
+    def __init__(self, detectors, trigger, process, download=None, buffer_factory=None, depth: int = 2):
+        if depth < 1:
+            raise ValueError(f"depth must be at least 1, got {depth}")
+        if isinstance(detectors, (Ftd2xxPool, dict)):
+            self._detectors = dict(detectors if isinstance(detectors, dict) else iter(detectors))
+        else:
+            self._detectors = {
+                Ftd2xxPool._key(helper._last_connected_serial_number or str(i)): helper
+                for i, helper in enumerate(detectors)
+            }
+        if not self._detectors:
+            raise ValueError("At least one detector is required")
+        self.trigger = trigger
+        self.process = process
+        self.download = download or (
+            lambda helper, buffer: helper.get_all_data_points_from_last_scan_santec_command(out=buffer)
+        )
+        self.depth = depth
+        buffer_factory = buffer_factory or (lambda: array.array(UINT32_TYPECODE))
+        self._buffers = [{key: buffer_factory() for key in self._detectors} for _ in range(depth)]
+        self._executor = ThreadPoolExecutor(max_workers=len(self._detectors), thread_name_prefix="ftd2xx-sweep")
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def _record(self, stage: str, seconds: float):
+        with self._lock:
+            timing = self._timings[stage]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+
+    def run(self, sweeps: int):
+        """Runs sweeps sweeps through the pipeline and returns stats(). The first error of any stage is raised."""
+        logger.info("Sweep pipeline run, sweeps: %d, depth: %d, detectors: %s", sweeps, self.depth, list(self._detectors))
+        free = queue.Queue()
+        for slot in range(self.depth):
+            free.put(slot)
+        ready = queue.Queue()
+        failures = []
+
+        def consume():
+            while True:
+                item = ready.get()
+                if item is None:
+                    return
+                index, slot, results = item
+                start = time.perf_counter()
+                try:
+                    if not failures:
+                        self.process(index, results)
+                except BaseException as e:
+                    logger.error("Sweep %d processing failed: %s", index, e)
+                    failures.append(e)
+                finally:
+                    self._record("process", time.perf_counter() - start)
+                    free.put(slot)
+
+        consumer = threading.Thread(target=consume, name="ftd2xx-sweep-process", daemon=True)
+        consumer.start()
+        started = time.perf_counter()
+        completed = 0
+        try:
+            for index in range(sweeps):
+                if failures:
+                    break
+                start = time.perf_counter()
+                slot = free.get()
+                now = time.perf_counter()
+                self._record("backpressure", now - start)
+
+                start = now
+                self.trigger(index)
+                now = time.perf_counter()
+                self._record("trigger", now - start)
+
+                start = now
+                buffers = self._buffers[slot]
+                futures = {
+                    key: self._executor.submit(self.download, helper, buffers[key])
+                    for key, helper in self._detectors.items()
+                }
+                wait(futures.values())
+                results = {key: future.result() for key, future in futures.items()}
+                self._record("download", time.perf_counter() - start)
+                ready.put((index, slot, results))
+                completed += 1
+        finally:
+            ready.put(None)
+            consumer.join()
+            with self._lock:
+                self._sweeps += completed
+                self._seconds += time.perf_counter() - started
+        if failures:
+            raise failures[0]
+        return self.stats()
+
+    def stats(self):
+        """Returns the sweep count and rate, and the count, total, mean and max seconds of every stage."""
+        with self._lock:
+            stages = {
+                stage: {"count": count, "total": total, "mean": total / count if count else 0.0, "max": longest}
+                for stage, (count, total, longest) in self._timings.items()
+            }
+            return {
+                "sweeps": self._sweeps,
+                "seconds": self._seconds,
+                "sweeps_per_second": self._sweeps / self._seconds if self._seconds else 0.0,
+                "stages": stages,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._timings = {stage: [0, 0.0, 0.0] for stage in SweepPipeline.stages}
+            self._sweeps = 0
+            self._seconds = 0.0
+
+    def close(self):
+        """Stops the download threads; the instruments stay open."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,26 @@
+import pytest
+
+from benchmarks.simulated_d2xx import SimulatedD2xx
+from src.ftd2xxhelper import Ftd2xxhelper, device_registry, probe_cache
+
+
+def _reset_globals():
+    probe_cache.invalidate()
+    device_registry.update([])
+
+
+@pytest.fixture
+def simulated_d2xx():
+    """
+    Returns a function that installs a SimulatedD2xx(**kwargs) as the D2XX library and returns it.
+    The library is uninstalled afterwards, and the probe cache and device registry start and end empty.
+    """
+    def install(**kwargs):
+        simulator = SimulatedD2xx(**kwargs)
+        Ftd2xxhelper.set_library(simulator.as_library())
+        return simulator
+
+    _reset_globals()
+    yield install
+    Ftd2xxhelper.set_library(None)
+    _reset_globals()
@@ -0,0 +1,68 @@
+from src.ftd2xxhelper import AdaptiveTiming, Ftd2xxhelper
+
+
+def test_adaptive_timing_defaults():
+    timing = AdaptiveTiming()
+    assert timing.read_deadline('WAV?', 1) == 1
+    assert timing.write_delay('WAV 1550') == timing.default_delay
+
+
+def test_adaptive_timing_learns():
+    timing = AdaptiveTiming(margin=2, max_deadline=10)
+    for _ in range(10):
+        timing.record('WAV?', 0.4)
+    assert abs(timing.read_deadline('WAV?', 1) - 0.8) < 1e-9
+    assert abs(timing.write_delay('WAV 1550') - 0.4) < 1e-9
+    assert timing.stats('wav?')['count'] == 10
+
+    timing.record('WAV:SWE 1', 60)
+    assert timing.read_deadline('WAV:SWE 1', 1) == 10
+
+    timing.reset('WAV?')
+    assert timing.stats('WAV?') is None
+
+
+def test_adaptive_timing_poll_mode_settles(simulated_d2xx):
+    simulated_d2xx(devices=1, latency=0.001)
+    device = Ftd2xxhelper(b'SIM00000')
+    timing = device.enable_adaptive_timing()
+    for _ in range(35):
+        assert device.query('POW?') == '0'
+    # The poll loop needs at least two 20 ms polls per reply; the pause before them is not latency.
+    assert timing.write_delay('POW 1') < 0.1
+    assert timing.read_deadline('POW?', 1) < 0.6
+    device.close_usb_connection()
+
+
+def test_adaptive_timing_slow_reply(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.002)
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    device.write('POW 5')
+    device.write('WAV 1550')
+    device.enable_adaptive_timing(AdaptiveTiming(min_deadline=0.01))
+    for _ in range(20):
+        assert device.query('POW?') == '5'
+    simulator.instruments[0].latency = 0.08
+    assert device.query('POW?') == '5'
+    simulator.instruments[0].latency = 0.002
+    assert device.query('WAV?') == '1550'
+    device.close_usb_connection()
+
+
+def test_adaptive_timing_write_batch(simulated_d2xx):
+    class RecordingTiming(AdaptiveTiming):
+        __slots__ = ["delays"]
+
+        def write_delay(self, command):
+            self.delays.append(command)
+            return super().write_delay(command)
+
+    simulated_d2xx(devices=1, latency=0.001)
+    device = Ftd2xxhelper(b'SIM00000')
+    timing = RecordingTiming()
+    timing.delays = []
+    device.enable_adaptive_timing(timing)
+    device.write_batch(['POW 3', 'WAV 1551'])
+    assert timing.delays == ['POW 3', 'WAV 1551']
+    assert device.query_batch(['POW?', 'WAV?']) == ['3', '1551']
+    device.close_usb_connection()
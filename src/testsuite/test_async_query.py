@@ -0,0 +1,18 @@
+import asyncio
+
+from src.ftd2xxhelper import Ftd2xxhelper, AsyncFtd2xxhelper
+
+devices = Ftd2xxhelper.list_devices()
+
+
+def test_async_query():
+    async def query_all():
+        instruments = [await AsyncFtd2xxhelper.open(device.SerialNumber) for device in devices]
+        try:
+            return await asyncio.gather(*(instrument.query_idn() for instrument in instruments))
+        finally:
+            await asyncio.gather(*(instrument.close() for instrument in instruments))
+
+    responses = asyncio.run(query_all())
+    assert len(responses) == len(devices)
+    assert all(isinstance(response, str) and len(response) > 0 for response in responses)
@@ -0,0 +1,51 @@
+import time
+
+from src.ftd2xxhelper import Ftd2xxhelper
+
+
+def test_background_reader(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=100)
+    device = Ftd2xxhelper(b'SIM00000')
+    device.start_background_reader()
+    assert device.query('*IDN?').startswith('SANTEC TSL-570,SIM00000')
+
+    instrument = simulator.instruments[0]
+    with instrument.lock:
+        instrument.pending.append((time.monotonic(), b'ALARM 1\r'))
+    time.sleep(0.1)
+    assert device.query('POW?').strip() == '0'
+    assert [frame for _, frame in device.late_frames()] == [b'ALARM 1\r']
+
+    assert device.get_all_data_points_from_last_scan_santec_command() == list(range(100))
+    assert device.query_batch(['POW?', 'WAV?']) == ['0', '0']
+    device.close_usb_connection()
+
+
+def test_background_reader_query_frame(simulated_d2xx):
+    simulated_d2xx(devices=1, latency=0.001)
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    device.write('POW 1')
+    device.write('WAV 2')
+    device.start_background_reader()
+    frames = [bytes(device.query_frame(command)) for command in ['POW?', 'WAV?', 'POW?', 'WAV?']]
+    assert frames == [b'1', b'2', b'1', b'2']
+    assert device.late_frames() == []
+    device.close_usb_connection()
+
+
+def test_background_reader_link_profile(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=100)
+    device = Ftd2xxhelper(b'SIM00000')
+    device.start_background_reader()
+    instrument = simulator.instruments[0]
+    with device.using_link_profile('bulk'):
+        assert (instrument.read_timeout, instrument.event_char) == (0.05, ord('\r'))
+        assert device.get_all_data_points_from_last_scan_santec_command() == list(range(100))
+    assert (instrument.read_timeout, instrument.event_char) == (0.05, ord('\r'))
+    device.set_read_mode('event')
+    device.set_read_mode('poll')
+    assert (instrument.read_timeout, instrument.event_char) == (0.05, ord('\r'))
+
+    device.stop_background_reader()
+    assert instrument.event_char is None
+    device.close_usb_connection()
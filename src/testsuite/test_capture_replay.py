@@ -0,0 +1,66 @@
+import ctypes
+
+from src.ftd2xxhelper import Ftd2xxhelper, PythonD2xx, ReplayD2xx, FT_OK
+
+serial_number = b'23110067'
+
+
+class EchoD2xx(PythonD2xx):
+    """Answers every command with its own text."""
+
+    def __init__(self):
+        self.rx = bytearray()
+
+    def FT_CreateDeviceInfoList(self, num_devices):
+        num_devices.contents.value = 1
+        return FT_OK
+
+    def FT_GetDeviceInfoList(self, nodes, num_devices):
+        nodes[0].SerialNumber = serial_number
+        nodes[0].Description = b'SANTEC ECHO'
+        return FT_OK
+
+    def FT_OpenEx(self, argument, flags, handle):
+        handle.contents.value = 1
+        return FT_OK
+
+    def FT_Close(self, handle):
+        return FT_OK
+
+    def FT_EE_Read(self, handle, program_data):
+        ctypes.memmove(program_data.contents.Manufacturer, b'SANTEC\0', 7)
+        return FT_OK
+
+    def FT_Write(self, handle, buffer, count, bytes_written):
+        self.rx += ctypes.string_at(buffer, count)
+        bytes_written.contents.value = count
+        return FT_OK
+
+    def FT_GetQueueStatus(self, handle, available):
+        available.contents.value = len(self.rx)
+        return FT_OK
+
+    def FT_Read(self, handle, buffer, count, bytes_read):
+        n = min(count, len(self.rx))
+        ctypes.memmove(buffer, bytes(self.rx[:n]), n)
+        del self.rx[:n]
+        bytes_read.contents.value = n
+        return FT_OK
+
+
+def test_capture_replay(tmp_path):
+    trace = str(tmp_path / 'session.trace')
+    try:
+        Ftd2xxhelper.set_library(EchoD2xx().as_library())
+        helper = Ftd2xxhelper(serial_number, read_mode='event')
+        helper.start_capture(trace)
+        recorded = [helper.query('POW?'), helper.query('WAV?')]
+        helper.stop_capture()
+
+        replay = ReplayD2xx(trace, realtime=False)
+        Ftd2xxhelper.set_library(replay.as_library())
+        helper = Ftd2xxhelper(replay.serial_number)
+        assert [helper.query('POW?'), helper.query('WAV?')] == recorded
+        assert replay.mismatches == 0
+    finally:
+        Ftd2xxhelper.set_library(None)
@@ -0,0 +1,22 @@
+from src.ftd2xxhelper import Ftd2xxhelper
+
+
+def test_iter_scan_data(simulated_d2xx):
+    simulated_d2xx(devices=1, latency=0.001, scan_points=10000, bytes_per_second=200e3)
+    device = Ftd2xxhelper(b'SIM00000')
+    device.write('POW 5')
+    chunks = list(device.iter_scan_data('santec', chunk_points=3000))
+    assert [len(chunk) for chunk in chunks] == [3000, 3000, 3000, 1000]
+    assert [value for chunk in chunks for value in chunk] == list(range(10000))
+    assert device.query('POW?') == '5'
+
+    chunks = list(device.iter_scan_data('santec', chunk_points=1000,
+                                        progress=lambda received, total: received < 2000))
+    assert len(chunks) == 2
+    assert device.query('POW?') == '5'
+
+    for chunk in device.iter_scan_data('scpi', chunk_points=1000):
+        assert len(chunk) == 1000
+        break
+    assert device.query('POW?') == '5'
+    device.close_usb_connection()
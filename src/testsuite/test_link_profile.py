@@ -0,0 +1,15 @@
+from src.ftd2xxhelper import Ftd2xxhelper, LINK_PROFILES
+
+devices = Ftd2xxhelper.list_devices()
+
+
+def test_link_profile():
+    helper = Ftd2xxhelper(devices[0].SerialNumber, link_profile='low-latency')
+    assert helper.link_profile == LINK_PROFILES['low-latency']
+
+    with helper.using_link_profile('bulk'):
+        assert helper.link_profile == LINK_PROFILES['bulk']
+        response = helper.query_idn()
+        assert len(response) > 0
+
+    assert helper.link_profile == LINK_PROFILES['low-latency']
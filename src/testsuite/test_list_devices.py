@@ -1,7 +1,23 @@
-from src.ftd2xxhelper import Ftd2xxhelper
+from src.ftd2xxhelper import Ftd2xxhelper, probe_cache
 
 
 def test_list_devices():
     devices = Ftd2xxhelper.list_devices()
     assert isinstance(devices, list)
     assert len(devices) >= 0
+
+
+def test_list_devices_parallel(simulated_d2xx):
+    simulator = simulated_d2xx(devices=4, probe_latency=0.1)
+    devices = Ftd2xxhelper.list_devices(parallel=True, max_workers=4)
+    assert [device.SerialNumber for device in devices] == [b'SIM00000', b'SIM00001', b'SIM00002', b'SIM00003']
+    assert 1 < simulator.max_concurrent_probes <= 4
+
+    # More wedged adapters than workers: the timeout runs from the start, so the queued probes
+    # are dropped instead of being started once a worker is free.
+    probe_cache.invalidate()
+    simulator.probes_started = simulator.max_concurrent_probes = 0
+    simulator.probe_latency = 1.0
+    assert Ftd2xxhelper.list_devices(parallel=True, max_workers=2, probe_timeout=0.2) == []
+    assert simulator.probes_started <= 2
+    assert simulator.max_concurrent_probes <= 2
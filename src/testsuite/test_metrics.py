@@ -0,0 +1,43 @@
+import json
+
+from src.ftd2xxhelper import Ftd2xxhelper, LatencyHistogram, MetricsRegistry
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for seconds in (0.0001, 0.0001, 0.0001, 0.003):
+        histogram.add(seconds)
+    assert histogram.count == 4
+    assert histogram.percentile(50) == 0.0001
+    assert histogram.percentile(99) == 0.003
+    assert histogram.to_dict()['buckets'] == {'<=0.0001': 3, '<=0.005': 1}
+
+
+def test_metrics(tmp_path, simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001)
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    registry = device.enable_metrics(MetricsRegistry())
+    device.query('*IDN?')
+    device.write_batch(['POW 1', 'WAV 1550'])
+    simulator.handles.clear()
+    device.enable_auto_reconnect()
+    device.query('POW?')
+
+    snapshot = registry.snapshot()['SIM00000']
+    assert snapshot['commands'] == {'*IDN?': 1, 'POW': 1, 'WAV': 1, 'POW?': 2}
+    assert snapshot['queries']['*IDN?']['count'] == 1
+    assert snapshot['ft_calls']['FT_OpenEx']['count'] == 1
+    assert snapshot['bytes_out'] == len('*IDN?\rPOW 1\rWAV 1550\rPOW?\r')
+    assert snapshot['bytes_in'] == len('SANTEC TSL-570,SIM00000,0029.0067.0001\r1\r')
+    assert snapshot['status'] == {'FT_INVALID_HANDLE': 2}  # the failed write and closing the lost handle
+    assert snapshot['reconnects'] == 1
+
+    registry.export_json(str(tmp_path / 'metrics.json'))
+    with open(tmp_path / 'metrics.json') as f:
+        assert 'SIM00000' in json.load(f)['instruments']
+    device.disable_metrics()
+    device.query('*IDN?')
+    assert registry.snapshot()['SIM00000']['commands']['*IDN?'] == 1
+    registry.reset()
+    assert registry.snapshot() == {}
+    device.close_usb_connection()
@@ -0,0 +1,56 @@
+import threading
+
+from src.ftd2xxhelper import Ftd2xxhelper, DeviceRegistry, probe_cache
+
+
+def test_device_registry(simulated_d2xx):
+    simulated_d2xx(devices=3)
+    registry = DeviceRegistry()
+    registry.update(Ftd2xxhelper().get_dev_info_list())
+    assert registry.by_serial('SIM00002').LocId == 0x1002
+    assert registry.by_location(0x1001).SerialNumber == b'SIM00001'
+    assert len(registry.by_description(b'SANTEC TSL-570')) == 3
+    assert registry.first('SANTEC').SerialNumber == b'SIM00000'
+    assert registry.by_serial(b'SIM00003') is None
+
+    snapshot = registry.snapshot()
+    registry.update([])
+    assert len(registry) == 0
+    assert snapshot.by_serial('SIM00002').LocId == 0x1002
+
+
+def test_device_registry_concurrent_update(simulated_d2xx):
+    simulated_d2xx(devices=3)
+    devices = Ftd2xxhelper().get_dev_info_list()
+    registry = DeviceRegistry()
+    registry.update(devices)
+    stop = threading.Event()
+
+    def update():
+        while not stop.is_set():
+            registry.update(devices)
+
+    thread = threading.Thread(target=update)
+    thread.start()
+    try:
+        missed = sum(registry.by_serial('SIM00002') is None or registry.first('SANTEC') is None
+                     for _ in range(20000))
+    finally:
+        stop.set()
+        thread.join()
+    assert missed == 0
+
+
+def test_open_direct(simulated_d2xx):
+    simulated_d2xx(devices=3)
+    device = Ftd2xxhelper('SIM00001', direct=True)
+    assert device.query('*IDN?').startswith('SANTEC TSL-570,SIM00001')
+    device.close_usb_connection()
+    assert probe_cache.get(b'SIM00001', 0) == 'SANTEC'
+
+    device = Ftd2xxhelper(location_id=0x1002)
+    assert device.query('*IDN?').startswith('SANTEC TSL-570,SIM00002')
+    device.close_usb_connection()
+    device.open_usb_connection()
+    assert device.is_alive()
+    device.close_usb_connection()
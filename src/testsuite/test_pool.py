@@ -0,0 +1,24 @@
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper, Ftd2xxPool
+
+devices = Ftd2xxhelper.list_devices()
+
+
+def test_gather_query():
+    with Ftd2xxPool([device.SerialNumber for device in devices]) as pool:
+        responses = pool.gather_query('*IDN?')
+        assert pool.errors == {}
+        assert set(responses) == set(pool.serial_numbers)
+        assert all(len(response) > 0 for response in responses.values())
+
+
+def test_pool_errors(simulated_d2xx):
+    simulated_d2xx(devices=2, latency=0.001)
+    with Ftd2xxPool(['SIM00000', 'SIM00001', 'SIM00009']) as pool:
+        assert set(pool.errors) == {'SIM00009'}
+        responses = pool.gather_query('*IDN?')
+        assert set(responses) == {'SIM00000', 'SIM00001'}
+        assert set(pool.errors) == {'SIM00009'}
+        with pytest.raises(ValueError, match='SIM00009'):
+            pool.gather_query('*IDN?', serial_numbers=['SIM00000', 'SIM00009'])
@@ -0,0 +1,25 @@
+import time
+
+from src.ftd2xxhelper import ProbeCache
+
+serial_number = b'23110067'
+location_id = 0x111
+
+
+def test_probe_cache():
+    cache = ProbeCache(ttl=60)
+    assert cache.get(serial_number, location_id) is None
+
+    cache.put(serial_number, location_id, 'SANTEC')
+    assert cache.get(serial_number, location_id) == 'SANTEC'
+    assert cache.get(serial_number, location_id + 1) is None
+
+    cache.invalidate(serial_number)
+    assert cache.get(serial_number, location_id) is None
+
+
+def test_probe_cache_expires():
+    cache = ProbeCache(ttl=0.01)
+    cache.put(serial_number, location_id, 'SANTEC')
+    time.sleep(0.02)
+    assert cache.get(serial_number, location_id) is None
@@ -0,0 +1,12 @@
+from src.ftd2xxhelper import Ftd2xxhelper
+
+devices = Ftd2xxhelper.list_devices()
+
+commands = ['*IDN?', 'POW?', 'WAV?']
+
+
+def test_query_batch():
+    helper = Ftd2xxhelper(devices[0].SerialNumber)
+    responses = helper.query_batch(commands)
+    assert len(responses) == len(commands)
+    assert all(len(response) > 0 for response in responses)
@@ -0,0 +1,65 @@
+from src.ftd2xxhelper import QueryCache
+
+
+def test_query_cache():
+    cache = QueryCache(cacheable=['*IDN?', 'WAV?', 'POW?'], max_entries=2, invalidates={'SWE': ['WAV?']})
+    assert not cache.is_cacheable('POW 1')
+    assert cache.get('WAV?') is None
+
+    cache.put('WAV?', '1550.000')
+    cache.put('POW?', '1.000')
+    assert cache.get('wav?') == '1550.000'
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.invalidate('WAV 1551')
+    assert cache.get('WAV?') is None
+    assert cache.get('POW?') == '1.000'
+
+    cache.put('WAV?', '1551.000')
+    cache.invalidate('SWE 1')
+    assert cache.get('WAV?') is None
+
+
+def test_query_cache_eviction():
+    cache = QueryCache(cacheable=['*IDN?', 'WAV?', 'POW?'], max_entries=2)
+    cache.put('*IDN?', 'SANTEC')
+    cache.put('WAV?', '1550.000')
+    cache.get('*IDN?')
+    cache.put('POW?', '1.000')
+    assert len(cache) == 2
+    assert cache.get('WAV?') is None
+    assert cache.get('*IDN?') == 'SANTEC'
+
+    cache.invalidate('*RST')
+    assert len(cache) == 0
+
+
+def test_query_cache_scpi_headers():
+    cache = QueryCache(cacheable=['*IDN?', 'WAV?', 'POWer?', 'SOUR:POW:STAT?'])
+    assert cache.is_cacheable('SOURce:POWer:STATe?')
+    assert not cache.is_cacheable('POW?;WAV?')
+    cache.put('POW?', '1.000')
+    assert cache.get('POWER?') == '1.000'
+
+    cache.invalidate('SOUR:POW 2')
+    assert cache.get('POW?') is None
+
+    cache.put('POW?', '2.000')
+    cache.put('WAV?', '1550.000')
+    cache.put(':SOUR:POW:STAT?', '1')
+    cache.invalidate('POWer 3')
+    assert cache.get('POW?') is None
+    assert cache.get('WAV?') == '1550.000'
+
+    cache.put('POW?', '3.000')
+    cache.invalidate('WAV?;:POW:STAT 0;WAVelength 1551')
+    assert len(cache) == 1
+    assert cache.get('POW?') == '3.000'
+
+    cache.put('*IDN?', 'SANTEC')
+    cache.invalidate('WAV 1550;*RST')
+    assert len(cache) == 0
+
+    cache.put('*IDN?', 'SANTEC')
+    cache.invalidate('SYST:COMM:GPIB#ADDR 5')
+    assert len(cache) == 0
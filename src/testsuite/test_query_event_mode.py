@@ -0,0 +1,10 @@
+from src.ftd2xxhelper import Ftd2xxhelper
+
+devices = Ftd2xxhelper.list_devices()
+
+
+def test_query_event_mode():
+    helper = Ftd2xxhelper(devices[0].SerialNumber, read_mode="event")
+    response = helper.query_idn()
+    assert isinstance(response, str)
+    assert len(response) > 0
@@ -0,0 +1,20 @@
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper
+
+
+def test_auto_reconnect(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001)
+    with Ftd2xxhelper(b'SIM00000', read_mode='event') as device:
+        assert device.is_alive()
+        simulator.handles.clear()
+        assert not device.is_alive()
+        with pytest.raises(IOError):
+            device.query('*IDN?')
+
+        device.enable_auto_reconnect()
+        assert device.query('*IDN?').startswith('SANTEC TSL-570,SIM00000')
+        stats = device.connection_stats()
+        assert stats['reconnects'] == 1 and stats['connected']
+        assert device.is_alive()
+    assert not device.is_alive()
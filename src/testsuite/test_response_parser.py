@@ -0,0 +1,29 @@
+import pytest
+
+from src.ftd2xxhelper import ResponseParser
+
+
+def test_response_parser_line():
+    parser = ResponseParser(b'\r\n')
+    data = bytearray(b'\r\nPOW 1.000\rWAV?\r')
+    assert parser.feed(data, 6) == -1
+    assert parser.feed(data, len(data)) == 12
+    start, end = parser.payload
+    assert (parser.frame_start, data[start:end]) == (2, b'POW 1.000')
+
+
+def test_response_parser_block():
+    parser = ResponseParser(b'\r')
+    data = bytearray(b'#210\r\r\r\r\r\r\r\r\r\r\r')
+    assert parser.feed(data, 3) == -1
+    assert parser.needed(3) == 0
+    assert parser.feed(data, 4) == -1
+    assert parser.needed(4) == 10
+    assert parser.feed(data, 9) == -1
+    assert parser.received == 5
+    assert parser.feed(data, len(data)) == 14
+    assert parser.payload == (4, 14)
+
+    assert ResponseParser.block_header(b'#0') == (2, None)
+    with pytest.raises(ValueError):
+        ResponseParser.block_header(b'#x')
@@ -0,0 +1,48 @@
+import os
+import struct
+import threading
+
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper, ScanArchive
+
+
+def test_scan_archive(tmp_path):
+    filename = str(tmp_path / 'scans.scan')
+    with ScanArchive(filename) as archive:
+        assert archive.append(struct.pack('>3I', 1, 2, 3), '>u4', b'12345678') == 0
+        assert archive.append(struct.pack('>2f', 1.5, 2.5), '>f4', b'12345678') == 1
+        with pytest.raises(RuntimeError):
+            with archive.writer(4, '>u4') as view:
+                view[:4] = b'\0\0\0\1'
+                raise RuntimeError('transfer failed')
+        assert len(archive) == 2
+
+    with ScanArchive(filename, readonly=True) as archive:
+        records = archive.records()
+        assert [(r.serial_number, r.points, r.dtype) for r in records] == [
+            (b'12345678', 3, '>u4'), (b'12345678', 2, '>f4')
+        ]
+        with open(filename, 'rb') as f:
+            data = f.read()
+        assert struct.unpack_from('>2f', data, records[1].offset) == (1.5, 2.5)
+
+        numpy = pytest.importorskip('numpy')
+        assert list(archive[0]) == [1, 2, 3]
+        assert isinstance(archive[1], numpy.memmap)
+
+
+def test_scan_archive_device_lost(tmp_path, simulated_d2xx):
+    filename = str(tmp_path / 'scans.scan')
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=200000, bytes_per_second=2e6)
+    device = Ftd2xxhelper(b'SIM00000')
+    with ScanArchive(filename) as archive:
+        timer = threading.Timer(0.15, simulator.handles.clear)
+        timer.start()
+        with pytest.raises(IOError) as error:
+            device.get_all_data_points_from_last_scan_santec_command(archive=archive)
+        timer.join()
+        assert 'FT_INVALID_HANDLE' in str(error.value)
+        assert len(archive) == 0
+        assert archive.append(struct.pack('>2I', 1, 2), '>u4') == 0
+    assert os.path.getsize(filename) == 16 + 48 + 8
@@ -0,0 +1,22 @@
+import array
+
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper, UINT32_TYPECODE
+
+
+def test_scan_santec_compact_and_out(simulated_d2xx):
+    simulated_d2xx(devices=1, latency=0.001, scan_points=1000)
+    device = Ftd2xxhelper(b'SIM00000')
+    values = device.get_all_data_points_from_last_scan_santec_command(compact=True)
+    assert values.typecode == UINT32_TYPECODE
+    assert list(values) == list(range(1000))
+
+    out = array.array(UINT32_TYPECODE, [7] * 10)
+    assert device.get_all_data_points_from_last_scan_santec_command(out=out) is out
+    assert list(out) == list(range(1000))
+
+    for typecode in ('f', 'i'):
+        with pytest.raises(ValueError):
+            device.get_all_data_points_from_last_scan_santec_command(out=array.array(typecode))
+    device.close_usb_connection()
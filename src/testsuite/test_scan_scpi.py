@@ -0,0 +1,32 @@
+import struct
+
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper
+
+
+def test_scan_scpi_indefinite_block(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=3)
+    instrument = simulator.instruments[0]
+    respond = instrument.respond
+    # Binary float data holding LF and CR bytes, in an indefinite-length block.
+    payload = struct.pack('>3I', 0x0A0D0A0D, 0x3F800000, 0x0D0A0000)
+    instrument.respond = lambda command: (b'#0' + payload + b'\n' if command.upper().startswith('READOUT:DATA?')
+                                          else respond(command))
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    values = device.get_all_data_points_from_last_scan_scpi_command()
+    assert values == list(struct.iter_unpack('>f', payload))
+    assert device.query('POW?') == '0'
+    device.close_usb_connection()
+
+
+def test_scan_scpi_short_block(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=3)
+    instrument = simulator.instruments[0]
+    respond = instrument.respond
+    instrument.respond = lambda command: (b'#18' + struct.pack('>2f', 1.0, 2.0) if command.upper().startswith('READOUT:DATA?')
+                                          else respond(command))
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    with pytest.raises(RuntimeError, match='8 of 12 bytes'):
+        device.get_all_data_points_from_last_scan_scpi_command()
+    device.close_usb_connection()
@@ -0,0 +1,31 @@
+import struct
+
+from src.ftd2xxhelper import Ftd2xxhelper
+
+
+def test_download_scan_segmented(simulated_d2xx):
+    simulated_d2xx(devices=1, latency=0.001, scan_points=3000)
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    progress = []
+    values = device.download_scan_segmented('santec', segment_points=1000,
+                                            progress=lambda received, total: progress.append(received))
+    assert list(values) == list(range(3000))
+    assert progress == [1000, 2000, 3000]
+
+    values = device.download_scan_segmented('scpi', segment_points=1000,
+                                            range_command='READout:DATa? {start},{count}')
+    assert len(values) == 3000
+    assert values[2999] == struct.unpack('>f', struct.pack('>f', 1500.0 + 2999 * 0.001))[0]
+    device.close_usb_connection()
+
+
+def test_download_scan_segmented_terminated_blocks(simulated_d2xx):
+    simulator = simulated_d2xx(devices=1, latency=0.001, scan_points=3000)
+    simulator.instruments[0].block_terminator = b'\r'
+    device = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    values = device.download_scan_segmented('scpi', segment_points=1000, retries=0,
+                                            range_command='READout:DATa? {start},{count}')
+    assert len(values) == 3000
+    assert values[1000] == struct.unpack('>f', struct.pack('>f', 1500.0 + 1000 * 0.001))[0]
+    assert device.query('POW?') == '0'
+    device.close_usb_connection()
@@ -0,0 +1,27 @@
+import pytest
+
+from src.ftd2xxhelper import Ftd2xxhelper, SweepPipeline
+
+
+def test_sweep_pipeline(simulated_d2xx):
+    simulated_d2xx(devices=3, latency=0.001, scan_points=500)
+    laser = Ftd2xxhelper(b'SIM00000', read_mode='event')
+    detectors = [Ftd2xxhelper(b'SIM00001', read_mode='event'), Ftd2xxhelper(b'SIM00002', read_mode='event')]
+    processed = []
+
+    def process(index, results):
+        processed.append((index, {key: list(data) for key, data in results.items()}))
+
+    with SweepPipeline(detectors, lambda index: laser.write('WAV 1550'), process) as pipeline:
+        stats = pipeline.run(4)
+    assert [index for index, _ in processed] == [0, 1, 2, 3]
+    assert processed[-1][1] == {'SIM00001': list(range(500)), 'SIM00002': list(range(500))}
+    assert stats['sweeps'] == 4
+    assert stats['stages']['download']['count'] == 4
+
+    def fail(index, results):
+        raise KeyError(index)
+
+    with SweepPipeline(detectors, lambda index: None, fail) as pipeline:
+        with pytest.raises(KeyError):
+            pipeline.run(3)